@@ -1,10 +1,12 @@
 """Base Class for a Blackjack Agent"""
 
 import numpy as np
-import seaborn as sns
-import matplotlib.pyplot as plt
-from matplotlib.colors import ListedColormap
 from gym_env.enums import Action
+from gym_env.profiling import AGENT_PHASES
+from agents.parallel import evaluate_parallel
+from agents.stats import StreamingStats
+from agents.reward_store import RewardStore, running_total, plot_running_total
+from agents.policy_table import PLAYER_SUMS, DEALER_CARDS, compile_policy, table_action
 
 class Agent:
     
@@ -14,55 +16,166 @@ class Agent:
         self.model = None
         self.actions = []
         self.rewards = []
+        self.stats = StreamingStats()
+        self.policy_table = None
+        self.reward_store = None
         
     def action(self, action_space, observation, info=None):
         """Calculates the action based on the observation and action space"""
         raise NotImplementedError("Base class agent does not have actions implemented!")
     
-    def run(self, episodes=100):
+    def __getstate__(self):
+        """
+        Pickles everything the agent was built or trained with, which is how run_parallel ships it to its workers.
+        The env, profiling wrappers and results of earlier runs stay behind; bind_env gives the copy an env.
+        """
+        state = {name: value for name, value in self.__dict__.items() if name not in AGENT_PHASES}
+        state.update(env=None, actions=[], rewards=[], stats=StreamingStats(), reward_store=None)
+        return state
+
+    def bind_env(self, env):
+        """Plays on env from now on"""
+        self.env = env
+
+    def bet(self):
+        """Units to bet on the next hand, decided before it is dealt. Agents that spread their bets override this."""
+        return 1
+    
+    def batch_action(self, observations, can_double):
+        """
+        Calculates the action for a batch of observations. Returns an array of Action values.
+        Agents with a batched model should override this.
+        """
+        legal_moves = [Action.STAY, Action.HIT]
+        actions = [
+            self.action(legal_moves + [Action.DOUBLE] if double else legal_moves, observation).value
+            for observation, double in zip(observations, can_double)
+        ]
+        return np.array(actions, dtype=np.int8)
+    
+    def compile_policy(self):
+        """
+        Queries the agent once on every state and stores the result in self.policy_table,
+        which run() and visualize_policy() then use instead of calling action().
+        Returns a CompiledAgent that plays from the same table.
+        """
+        from agents.agent_compiled import CompiledAgent # agent_compiled imports this module
+        self.policy_table = compile_policy(self)
+        return CompiledAgent(self.name, self.env, self.policy_table)
+    
+    def enable_profiling(self, profiler=None):
+        """
+        Times the env's phases and the agent's decisions with one PhaseProfiler, which is returned.
+        Snapshots are taken per hand played by run().
+        """
+        profiler = self.env.unwrapped.enable_profiling(profiler)
+        profiler.instrument(self, AGENT_PHASES)
+        return profiler
+    
+    def disable_profiling(self):
+        profiler = self.env.unwrapped.profiler
+        if profiler is not None:
+            profiler.uninstrument(self)
+            self.env.unwrapped.disable_profiling()
+    
+    def log_rewards(self, path, chunk_size=1 << 20, append=False):
+        """
+        Streams the reward and action counts of every episode that run() and run_parallel() play to a
+        memory-mapped RewardStore in the directory path, which get_metrics() then plots from
+        """
+        self.reward_store = RewardStore(path, "a" if append else "w", chunk_size)
+        return self.reward_store
+    
+    def load_rewards(self, path):
+        """Opens the RewardStore of a finished run read-only, so get_metrics() can replot it without playing again"""
+        self.reward_store = RewardStore(path, "r")
+        return self.reward_store
+    
+    def _table_action(self, action_space, observation):
+        return table_action(self.policy_table, action_space, observation)
+    
+    def run(self, episodes=100, streaming=False, target_ci_width=None, min_episodes=1000):
         """
         Runs the agent for a certain number of episodes. 
-        Records the rewards for each episode and the actions taken.
+        Records the rewards for each episode and the actions taken, and always updates self.stats.
+
+        Args:
+            episodes (int): Number of episodes to run, or the maximum number when target_ci_width is set
+            streaming (bool): If True, only update self.stats so memory use stays constant
+            target_ci_width (float, optional): Stop once the 95% confidence interval on the reward per hand is narrower than this
+            min_episodes (int): Episodes of this call to run before the stopping rule is checked
+
+        Returns:
+            self.stats, which includes earlier runs. The stopping rule only looks at this call's episodes
         """
+        stats = StreamingStats() # Merged into self.stats at the end
+        action_counts = stats.action_counts
+        store = self.reward_store
+        action = self.action if self.policy_table is None else self._table_action
         for epoch in range(episodes):
-            self.env.reset()
+            bet = self.bet()
+            self.env.reset(options={"bet": bet})
             game_actions = []
+            episode_counts = [0] * len(Action)
             while not self.env.terminated:
                 self.env.render()
-                act = self.action(self.env.legal_moves, self.env.observation)
-                game_actions.append(act)
+                act = action(self.env.legal_moves, self.env.observation)
+                action_counts[Action(act).value] += 1
+                episode_counts[Action(act).value] += 1
+                if not streaming:
+                    game_actions.append(act)
                 self.env.step(act)
             self.env.render()
-            self.actions.append(game_actions)
-            self.rewards.append(self.env.reward)
-            
-    def get_metrics(self):
-        """Shows the metrics of the agent's performance."""
-        running_totals = [0]
-        for reward in self.rewards:
-            running_totals.append(running_totals[-1] + reward)
+            stats.update(self.env.reward, bet)
+            if store is not None:
+                store.append(self.env.reward, episode_counts)
+            if not streaming:
+                self.actions.append(game_actions)
+                self.rewards.append(self.env.reward)
+            if target_ci_width is not None and epoch + 1 >= min_episodes and stats.ci_width() < target_ci_width:
+                break
+        if store is not None:
+            store.flush()
+        self.stats.merge(stats)
+        return self.stats
+    
+    def run_parallel(self, episodes=100, workers=None, seed=None, env_kwargs=None):
+        """
+        Runs copies of the agent for a certain number of episodes on a pool of worker processes, without rendering.
+        The workers' statistics are merged into self.stats. The reward of every episode only comes back when a
+        reward store is set (log_rewards), and is then streamed to it rather than kept in self.rewards.
+        """
+        store = self.reward_store
+        result = evaluate_parallel(self, episodes, workers, seed, env_kwargs, rewards=store is not None)
+        if store is not None:
+            store.extend(result.rewards) # Only totals of the actions come back from the workers
+            store.flush()
+        self.stats.merge(result.stats)
+        return result
             
-        plt.plot(running_totals)
-        plt.xlabel("Episode")
-        plt.ylabel("Running Total")
-        plt.title(f"Running Total For {self.name} Agent")
+    def get_metrics(self, points=4000):
+        """
+        Shows the metrics of the agent's performance. Reads the rewards from the reward store when one is set.
 
-        plt.savefig(f"results/{self.name}_agent_running_total.png")
+        Args:
+            points (int, optional): Decimate the running total to about this many points. None plots every episode
+        """
+        if self.reward_store is not None:
+            x, y = self.reward_store.running_total(points)
+        else:
+            x, y = running_total([np.asarray(self.rewards)], len(self.rewards), points)
+        plot_running_total(x, y, self.name, f"results/{self.name}_agent_running_total.png")
         
     def visualize_policy(self):
-        states = [np.array([x, y, z]) for x in range(3, 22) for y in range(2, 12) for z in range(2)]
-        actions = []
+        import seaborn as sns
+        import matplotlib.pyplot as plt
+        from matplotlib.colors import ListedColormap
         
-        if self.model:
-            actions = [self.model.predict(np.array(state))[0] for state in states]
-        else:
-            for state in states:
-                legal_moves = [Action.STAY, Action.HIT, Action.DOUBLE]
-                act = self.action(legal_moves, state)
-                actions.append(act.value)
+        table = self.policy_table if self.policy_table is not None else compile_policy(self)
+        states = (slice(PLAYER_SUMS.start, PLAYER_SUMS.stop), slice(DEALER_CARDS.start, DEALER_CARDS.stop))
 
-        hard_action_matrix = np.array(actions).reshape((19, 10, 2))[:, :, 0] # Hard total
-        soft_action_matrix = np.array(actions).reshape((19, 10, 2))[:, :, 1] # Soft total
+        hard_action_matrix = table[states + (0, 1)] # Hard total, DOUBLE allowed
+        soft_action_matrix = table[states + (1, 1)] # Soft total, DOUBLE allowed
         
         cmap = sns.cubehelix_palette(start=2.8, rot=.1, light=0.9, n_colors=3)
         grid_kws = {'width_ratios': (0.9, 0.03), 'wspace': 0.18}
@@ -1,16 +1,27 @@
 """Agent that plays by the book"""
 
 from agents.agent import Agent
+from agents.policy_table import PLAYER_SUMS, DEALER_CARDS, ACTIONS
 from gym_env.enums import Action
 
 class BasicStrategyAgent(Agent):
     
-    def __init__(self, name, env):
+    def __init__(self, name, env, solver=None):
+        """
+        Args:
+            solver (analysis.solver.Solver, optional): Derive the strategy from the solver's rules instead of the book
+        """
         super().__init__(name, env)
         self.hard_total_action = {}
         self.soft_total_action = {}
-        self._initialize_hard_strategy()
-        self._initialize_soft_strategy()
+        # What to play instead of DOUBLE once the hand has more than two cards. HIT if missing.
+        self.hard_no_double_action = {}
+        self.soft_no_double_action = {}
+        if solver is None:
+            self._initialize_hard_strategy()
+            self._initialize_soft_strategy()
+        else:
+            self._initialize_from_solver(solver)
         
     def _initialize_hard_strategy(self):
         """Creates the basic strategy used by the agent when there is no usable ace."""
@@ -48,14 +59,31 @@ class BasicStrategyAgent(Agent):
         for player_hand in range(19, 22):
             self.soft_total_action[player_hand] = {dealer_card: Action.STAY for dealer_card in range(2, 12)}
             
+    def _initialize_from_solver(self, solver):
+        """Creates both strategies from the solver's optimal policy."""
+        table = solver.optimal_policy()
+        for usable_ace, total_action, no_double_action in [
+            (0, self.hard_total_action, self.hard_no_double_action),
+            (1, self.soft_total_action, self.soft_no_double_action),
+        ]:
+            for player_sum in PLAYER_SUMS:
+                total_action[player_sum] = {
+                    dealer_card: ACTIONS[table[player_sum, dealer_card, usable_ace, 1]] for dealer_card in DEALER_CARDS
+                }
+                no_double_action[player_sum] = {
+                    dealer_card: ACTIONS[table[player_sum, dealer_card, usable_ace, 0]] for dealer_card in DEALER_CARDS
+                }
+            
     def action(self, action_space, observation):
-        player_sum, dealer_card, usable_ace = observation
+        player_sum, dealer_card, usable_ace = observation[:3]
         if not usable_ace:
             act = self.hard_total_action[player_sum][dealer_card]
+            no_double_action = self.hard_no_double_action
         else:
             act = self.soft_total_action[player_sum][dealer_card]
+            no_double_action = self.soft_no_double_action
         if act not in action_space: # Trying to double when not possible
-            return Action.HIT
+            return no_double_action.get(player_sum, {}).get(dealer_card, Action.HIT)
         else:
             return act
         
@@ -0,0 +1,13 @@
+"""Agent that plays a precompiled policy table"""
+
+from agents.agent import Agent
+from agents.policy_table import table_action
+
+class CompiledAgent(Agent):
+    
+    def __init__(self, name, env, table):
+        super().__init__(name, env)
+        self.policy_table = table
+        
+    def action(self, action_space, observation):
+        return table_action(self.policy_table, action_space, observation)
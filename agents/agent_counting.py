@@ -0,0 +1,111 @@
+"""Agent that plays basic strategy, counts cards with Hi-Lo, spreads its bets and deviates from the book by the count"""
+
+import math
+
+import numpy as np
+
+from agents.agent_basic_strategy import BasicStrategyAgent
+from agents.policy_table import TABLE_SHAPE, ACTIONS, policy_states
+from gym_env.enums import Action
+from gym_env.env import LEGAL_MOVES, STAY_HIT_MASK, ALL_ACTIONS_MASK
+
+# True counts the tables are indexed by. The true count is floored and clipped to this range.
+TRUE_COUNTS = range(-10, 11)
+
+# Hi-Lo index plays of the Illustrious 18 that need neither splits nor insurance:
+# (player sum, dealer card, usable ace, index, action at or above the index, action below it)
+DEVIATIONS = (
+    (16, 10, 0, 0, Action.STAY, Action.HIT),
+    (15, 10, 0, 4, Action.STAY, Action.HIT),
+    (10, 10, 0, 4, Action.DOUBLE, Action.HIT),
+    (12, 3, 0, 2, Action.STAY, Action.HIT),
+    (12, 2, 0, 3, Action.STAY, Action.HIT),
+    (11, 11, 0, 1, Action.DOUBLE, Action.HIT),
+    (9, 2, 0, 1, Action.DOUBLE, Action.HIT),
+    (10, 11, 0, 4, Action.DOUBLE, Action.HIT),
+    (9, 7, 0, 3, Action.DOUBLE, Action.HIT),
+    (16, 9, 0, 5, Action.STAY, Action.HIT),
+    (13, 2, 0, -1, Action.STAY, Action.HIT),
+    (12, 4, 0, 0, Action.STAY, Action.HIT),
+    (12, 5, 0, -2, Action.STAY, Action.HIT),
+    (12, 6, 0, -1, Action.STAY, Action.HIT),
+    (13, 3, 0, -2, Action.STAY, Action.HIT),
+)
+
+# Units bet from each true count up. 1 unit below the lowest
+BET_SPREAD = {2: 2, 3: 4, 4: 6, 5: 8}
+
+class CountingAgent(BasicStrategyAgent):
+    """
+    Reads the true count from the observation when the env appends it (count_observation=True) and from the env
+    otherwise. Its strategy and bet for every true count are precomputed into arrays, so a decision is a single
+    table lookup like a compiled basic strategy. Counting only pays off with a shoe that persists across hands,
+    e.g. gym.make("blackjack_env-v0", num_decks=6, penetration=0.75).
+    """
+
+    def __init__(self, name, env, solver=None, deviations=DEVIATIONS, bet_spread=BET_SPREAD):
+        """
+        Args:
+            solver (analysis.solver.Solver, optional): Derive the basic strategy from the solver's rules instead of the book
+            deviations (tuple): Index plays, as in DEVIATIONS
+            bet_spread (dict): True count -> units bet from that count up, as in BET_SPREAD
+        """
+        super().__init__(name, env, solver)
+        self.count_env = env.unwrapped # Skips the wrappers' attribute lookups on every decision
+        self.count_table = self._build_count_table(deviations)
+        self.bet_table = self._build_bet_table(bet_spread)
+
+    def __getstate__(self):
+        return {**super().__getstate__(), "count_env": None}
+
+    def bind_env(self, env):
+        super().bind_env(env)
+        self.count_env = env.unwrapped
+
+    def action(self, action_space, observation):
+        true_count = observation[4] if len(observation) == 5 else self.count_env.true_count
+        return ACTIONS[self.count_table[
+            _count_index(true_count), int(observation[0]), int(observation[1]), int(observation[2]),
+            int(Action.DOUBLE in action_space),
+        ]]
+
+    def batch_action(self, observations, can_double):
+        observations = np.asarray(observations)
+        if observations.shape[1] == 5:
+            true_counts = observations[:, 4]
+        else:
+            true_counts = np.full(len(observations), self.count_env.true_count)
+        counts = np.clip(np.floor(true_counts), TRUE_COUNTS.start, TRUE_COUNTS.stop - 1).astype(np.intp) - TRUE_COUNTS.start
+        index = observations[:, :3].astype(np.intp)
+        return self.count_table[counts, index[:, 0], index[:, 1], index[:, 2], np.asarray(can_double, dtype=np.intp)]
+
+    def bet(self):
+        return self.bet_table[_count_index(self.count_env.next_hand_true_count())]
+
+    def _build_count_table(self, deviations):
+        """Basic strategy copied once per true count, with every index play applied where the count calls for it"""
+        basic = np.full(TABLE_SHAPE, Action.STAY.value, dtype=np.int8)
+        observations, can_double = policy_states()
+        for (player_sum, dealer_card, usable_ace), double in zip(observations.astype(int).tolist(), can_double):
+            legal_moves = LEGAL_MOVES[ALL_ACTIONS_MASK if double else STAY_HIT_MASK]
+            act = BasicStrategyAgent.action(self, legal_moves, (player_sum, dealer_card, usable_ace))
+            basic[player_sum, dealer_card, usable_ace, int(double)] = act.value
+
+        table = np.repeat(basic[np.newaxis], len(TRUE_COUNTS), axis=0)
+        for player_sum, dealer_card, usable_ace, index, above, below in deviations:
+            for i, true_count in enumerate(TRUE_COUNTS):
+                act = above if true_count >= index else below
+                table[i, player_sum, dealer_card, usable_ace, 1] = act.value
+                table[i, player_sum, dealer_card, usable_ace, 0] = (Action.HIT if act == Action.DOUBLE else act).value
+        return table
+
+    def _build_bet_table(self, bet_spread):
+        bets = []
+        for true_count in TRUE_COUNTS:
+            counts = [count for count in bet_spread if count <= true_count]
+            bets.append(bet_spread[max(counts)] if counts else 1)
+        return tuple(bets)
+
+def _count_index(true_count):
+    """Row of the tables for a true count"""
+    return min(max(math.floor(true_count), TRUE_COUNTS.start), TRUE_COUNTS.stop - 1) - TRUE_COUNTS.start
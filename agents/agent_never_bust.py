@@ -10,7 +10,7 @@ class NeverBustAgent(Agent):
         super().__init__(name, env)
         
     def action(self, action_space, observation):
-        player_sum, dealer_card, usable_ace = observation
+        player_sum, dealer_card, usable_ace = observation[:3]
         if player_sum == 11 and Action.DOUBLE in action_space:
             return Action.DOUBLE
         elif player_sum >= 12:
@@ -0,0 +1,49 @@
+"""Blackjack agent that plays an exported PPO policy with NumPy only, no torch or stable_baselines3"""
+
+import numpy as np
+
+from gym_env.enums import Action
+from agents.agent import Agent
+
+ACTIVATIONS = {
+    "tanh": np.tanh,
+    "relu": lambda x: np.maximum(x, 0),
+    "identity": lambda x: x,
+}
+
+class NumpyPolicyAgent(Agent):
+    """Greedy actions of a policy network saved by PPOAgent.export_numpy"""
+
+    def __init__(self, name, env, path="ppo_blackjack.npz"):
+        super().__init__(name, env)
+        self.path = path
+        with np.load(path) as saved:
+            activations = [str(a) for a in saved["activations"]]
+            self.layers = [
+                (saved[f"weight_{i}"], saved[f"bias_{i}"], ACTIVATIONS[activation])
+                for i, activation in enumerate(activations)
+            ]
+            self.obs_mean = saved["obs_mean"] if "obs_mean" in saved else None
+            if self.obs_mean is not None:
+                self.obs_std = np.sqrt(saved["obs_var"] + saved["epsilon"])
+                self.clip_obs = float(saved["clip_obs"])
+
+    def logits(self, observations):
+        """Action logits of an (N, 3) batch of observations"""
+        x = np.asarray(observations, dtype=np.float32)
+        if self.obs_mean is not None:
+            x = np.clip((x - self.obs_mean) / self.obs_std, -self.clip_obs, self.clip_obs)
+        for weight, bias, activation in self.layers:
+            x = activation(x @ weight + bias)
+        return x
+
+    def action(self, action_space, observation, info=None):
+        act = Action(int(np.argmax(self.logits(np.reshape(observation, (1, -1)))[0])))
+        if act not in action_space:
+            return Action.HIT
+        return act
+
+    def batch_action(self, observations, can_double):
+        actions = np.argmax(self.logits(observations), axis=1).astype(np.int8)
+        actions[(actions == Action.DOUBLE.value) & ~np.asarray(can_double, dtype=bool)] = Action.HIT.value
+        return actions
@@ -1,35 +1,195 @@
 """Blackjack agent trained using the PPO algorithm"""
 
+import os
+import time
+
 import gym
 import gym_env
+import numpy as np
 from gym_env.enums import Action
 from agents.agent import Agent
-from gym.wrappers import NormalizeObservation, NormalizeReward
 from stable_baselines3 import PPO
+from stable_baselines3.common.callbacks import BaseCallback, CheckpointCallback
+from stable_baselines3.common.env_util import make_vec_env
+from stable_baselines3.common.vec_env import DummyVecEnv, SubprocVecEnv, VecNormalize
+from stable_baselines3.common.torch_layers import FlattenExtractor
+from torch import nn
+
+# Layers of the policy network -> activation names understood by agents.agent_numpy
+ACTIVATION_NAMES = {nn.Tanh: "tanh", nn.ReLU: "relu"}
+
+def make_env():
+    """Builds one training copy of the environment"""
+    return gym.make("blackjack_env-v0", verbose=False)
+
+class ThroughputCallback(BaseCallback):
+    """Reports environment timesteps per second after every rollout"""
+
+    def __init__(self):
+        super().__init__()
+        self.start_time = None
+        self.start_timesteps = None
+
+    def _on_training_start(self):
+        self.start_time = time.perf_counter()
+        self.start_timesteps = self.num_timesteps
+
+    def _on_step(self):
+        return True
+
+    def _on_rollout_end(self):
+        self.logger.record("time/timesteps_per_sec", self.timesteps_per_sec())
+
+    def timesteps_per_sec(self):
+        elapsed = time.perf_counter() - self.start_time
+        return (self.num_timesteps - self.start_timesteps) / elapsed if elapsed else 0.0
 
 class PPOAgent(Agent):
-    
-    def __init__(self, name, env):
+
+    def __init__(self, name, env, model_path="ppo_blackjack"):
         super().__init__(name, env)
-        self.model = PPO.load("ppo_blackjack")
+        self.model_path = model_path
+        self._load()
         # self.model = PPO("MlpPolicy", self.env, verbose=1)
-    
-    def train(self, timesteps=1000):
-        env_norm = NormalizeObservation(self.env)
-        env_norm = NormalizeReward(env_norm)
-        self.model.learn(total_timesteps=timesteps)
-        self.model.save("ppo_blackjack")
-    
+
+    def __getstate__(self):
+        """The model is not pickled. Copies load it from model_path, where train() saves it"""
+        return {**super().__getstate__(), "model": None, "obs_normalizer": None}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._load()
+
+    def _load(self):
+        self.model = PPO.load(self.model_path) if os.path.exists(f"{self.model_path}.zip") else None # None until trained
+        self.obs_normalizer = None
+        if os.path.exists(self._normalizer_path()):
+            self.obs_normalizer = VecNormalize.load(self._normalizer_path(), DummyVecEnv([make_env]))
+            self.obs_normalizer.training = False
+
+    def train(self, timesteps=1000, n_envs=1, subprocess=False, normalize=None, checkpoint_freq=None,
+              checkpoint_dir="checkpoints", from_scratch=False, hyperparameters=None, callbacks=None):
+        """
+        Trains the model on n_envs copies of the environment and saves it to model_path.
+        The throughput is printed unless the model's verbose is 0.
+
+        Args:
+            timesteps (int): Total environment timesteps, summed over all copies
+            n_envs (int): Number of environment copies stepped together
+            subprocess (bool): Step the copies in subprocesses instead of in this process
+            normalize (bool, optional): Normalize observations and rewards. The statistics are saved next to the model and used
+                for inference. Defaults to True for a new model and to however the saved model was trained otherwise
+            checkpoint_freq (int, optional): Save a checkpoint every this many timesteps
+            checkpoint_dir (str): Where checkpoints are written
+            from_scratch (bool): Start from a new model instead of the saved one. Always done when there is no saved model
+            hyperparameters (dict, optional): Keyword arguments of PPO for a new model, e.g. learning_rate or n_steps
+            callbacks (list, optional): Extra stable_baselines3 callbacks. The agent acts with the statistics being trained
+
+        Returns:
+            dict with the timesteps trained, the seconds taken and timesteps per second
+        """
+        from_scratch = from_scratch or self.model is None
+        if normalize is None:
+            normalize = from_scratch or self.obs_normalizer is not None
+        vec_env = make_vec_env(make_env, n_envs=n_envs, vec_env_cls=SubprocVecEnv if subprocess else DummyVecEnv)
+        if normalize and not from_scratch and self.obs_normalizer is not None:
+            vec_env = VecNormalize.load(self._normalizer_path(), vec_env) # Keep the statistics the model was trained with
+            vec_env.training = True
+        elif normalize:
+            vec_env = VecNormalize(vec_env)
+        if from_scratch:
+            self.model = PPO("MlpPolicy", vec_env, **{"verbose": 1, **(hyperparameters or {})})
+        else:
+            self.model = PPO.load(self.model_path, env=vec_env) # Sizes the rollout buffer for n_envs
+
+        self.obs_normalizer = vec_env if normalize else None
+        self.policy_table = None
+        throughput = ThroughputCallback()
+        callbacks = [throughput] + list(callbacks or [])
+        if checkpoint_freq:
+            callbacks.append(CheckpointCallback(
+                save_freq=max(checkpoint_freq // n_envs, 1), save_path=checkpoint_dir,
+                name_prefix=self.name, save_vecnormalize=normalize
+            ))
+
+        start = time.perf_counter()
+        self.model.learn(total_timesteps=timesteps, callback=callbacks)
+        seconds = time.perf_counter() - start
+        self.model.save(self.model_path)
+        if normalize:
+            vec_env.save(self._normalizer_path())
+            vec_env.training = False
+            self.obs_normalizer = vec_env
+        elif os.path.exists(self._normalizer_path()):
+            os.remove(self._normalizer_path())
+            self.obs_normalizer = None
+        vec_env.close()
+        self.policy_table = None
+
+        stats = {"timesteps": throughput.num_timesteps, "seconds": seconds, "timesteps_per_sec": throughput.timesteps_per_sec()}
+        if self.model.verbose:
+            print(f"Trained {stats['timesteps']} timesteps in {seconds:.1f}s ({stats['timesteps_per_sec']:,.0f} timesteps/s)")
+        return stats
+
+    def export_numpy(self, path=None):
+        """
+        Saves the policy network's weights, and the observation normalization if any, to a .npz file that
+        agents.agent_numpy.NumpyPolicyAgent plays from without torch or stable_baselines3.
+
+        Args:
+            path (str, optional): Defaults to model_path with a .npz extension
+
+        Returns:
+            the path written
+        """
+        policy = self.model.policy
+        if not isinstance(policy.pi_features_extractor, FlattenExtractor):
+            raise ValueError("Only policies with a FlattenExtractor can be exported")
+        arrays = {}
+        activations = []
+        for module in list(policy.mlp_extractor.policy_net) + [policy.action_net]:
+            if isinstance(module, nn.Linear):
+                arrays[f"weight_{len(activations)}"] = module.weight.detach().cpu().numpy().T.astype(np.float32)
+                arrays[f"bias_{len(activations)}"] = module.bias.detach().cpu().numpy().astype(np.float32)
+                activations.append("identity")
+            elif type(module) in ACTIVATION_NAMES and activations:
+                activations[-1] = ACTIVATION_NAMES[type(module)]
+            else:
+                raise ValueError(f"Cannot export a {type(module).__name__} layer")
+        arrays["activations"] = np.array(activations)
+        if self.obs_normalizer is not None and self.obs_normalizer.norm_obs:
+            arrays["obs_mean"] = self.obs_normalizer.obs_rms.mean.astype(np.float32)
+            arrays["obs_var"] = self.obs_normalizer.obs_rms.var.astype(np.float32)
+            arrays["clip_obs"] = np.float32(self.obs_normalizer.clip_obs)
+            arrays["epsilon"] = np.float32(self.obs_normalizer.epsilon)
+        path = path or f"{self.model_path}.npz"
+        np.savez(path, **arrays)
+        return path
+
     def action(self, action_space, observation, info=None):
-        act, _states = self.model.predict(observation)
+        act, _states = self.model.predict(self._normalize(observation))
         if Action(act) not in action_space:
             return Action.HIT
         return Action(act)
-    
-    def run(self, load=False, episodes=100):
+
+    def batch_action(self, observations, can_double):
+        actions, _states = self.model.predict(self._normalize(observations), deterministic=True)
+        actions = np.asarray(actions, dtype=np.int8)
+        actions[(actions == Action.DOUBLE.value) & ~can_double] = Action.HIT.value
+        return actions
+
+    def run(self, load=False, episodes=100, **kwargs):
         # if load:
         #     try:
         #         self.model = PPO.load("ppo_blackjack")
         #     except:
         #         raise FileNotFoundError("Saved PPO model not found")
-        super().run(episodes)
\ No newline at end of file
+        return super().run(episodes, **kwargs)
+
+    def _normalize(self, observation):
+        if self.obs_normalizer is None:
+            return observation
+        return self.obs_normalizer.normalize_obs(observation)
+
+    def _normalizer_path(self):
+        return f"{self.model_path}_vecnormalize.pkl"
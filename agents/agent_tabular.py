@@ -0,0 +1,160 @@
+"""Blackjack agent that learns a table of action values from batches of simulated hands"""
+
+import os
+import time
+
+import numpy as np
+
+from gym_env.batch_env import BatchBlackjack
+from gym_env.enums import Action, BASIC_ACTIONS
+from agents.agent import Agent
+from agents.policy_table import TABLE_SHAPE, table_action
+
+METHODS = ("monte_carlo", "q_learning")
+
+class TabularAgent(Agent):
+    """
+    Keeps Q(player sum, dealer show card, usable ace, DOUBLE legal, action) in a NumPy array and plays greedily on it.
+    Training plays batch_size hands in lockstep on a BatchBlackjack and updates the table once per batch
+    (Monte Carlo) or once per lockstep step (Q-learning), never one transition at a time.
+    """
+
+    def __init__(self, name, env, model_path="tabular_blackjack"):
+        super().__init__(name, env)
+        self.model_path = model_path
+        self.q = np.zeros(TABLE_SHAPE + (len(BASIC_ACTIONS),))
+        self.visits = np.zeros(self.q.shape, dtype=np.int64)
+        if os.path.exists(self._path()):
+            with np.load(self._path()) as saved:
+                self.q[...] = saved["q"]
+                self.visits[...] = saved["visits"]
+        self.greedy_table = self.greedy_policy()
+
+    def train(self, episodes=3000000, batch_size=50000, method="q_learning", epsilon=0.3, alpha=None, num_decks=1,
+              seed=None, solver=None, verbose=True):
+        """
+        Learns the action values and saves them to model_path.
+
+        Args:
+            episodes (int): Number of hands to play
+            batch_size (int): Hands played in lockstep per batch
+            method (str): "monte_carlo" for every-visit Monte Carlo control, "q_learning" for Q-learning
+            epsilon (float): Probability of taking a random legal action instead of the greedy one
+            alpha (float, optional): Q-learning step size. Defaults to averaging every target seen, like Monte Carlo
+                averages every return
+            num_decks (int): Number of decks in each hand's shoe
+            seed (int, optional): Seeds the hands and the exploration
+            solver (analysis.solver.Solver, optional): Reports the exact EV of the greedy policy after every batch
+            verbose (bool): Print the solver's report after every batch
+
+        Returns:
+            list with one dict per batch: episodes played so far, seconds, hands per second and, with a solver,
+            the greedy policy's exact EV and its gap to optimal play
+        """
+        if method not in METHODS:
+            raise ValueError(f"method must be one of {METHODS}, got {method!r}")
+        rng = np.random.default_rng(seed)
+        env = BatchBlackjack(batch_size, num_decks)
+        env.reset(seed=seed)
+        optimal = solver.expected_value() if solver is not None else None
+        history = []
+        played = 0
+        start = time.perf_counter()
+        while played < episodes:
+            if method == "monte_carlo":
+                self._monte_carlo_batch(env, rng, epsilon)
+            else:
+                self._q_learning_batch(env, rng, epsilon, alpha)
+            played += batch_size
+            seconds = time.perf_counter() - start
+            progress = {"episodes": played, "seconds": seconds, "hands_per_sec": played / seconds}
+            if solver is not None:
+                progress["ev"] = solver.policy_ev(self.greedy_policy())
+                progress["ev_gap"] = optimal - progress["ev"]
+                if verbose:
+                    print(f"{played} hands, {seconds:.1f}s: exact EV {progress['ev']:.5f} ({progress['ev_gap']:.5f} below optimal)")
+            history.append(progress)
+
+        self.greedy_table = self.greedy_policy()
+        self.policy_table = None
+        np.savez(self._path(), q=self.q, visits=self.visits)
+        return history
+
+    def greedy_policy(self):
+        """The action with the highest value in every state, as a policy table (see agents.policy_table)"""
+        return np.argmax(self._legal_values(self.q, np.arange(2)), axis=-1).astype(np.int8)
+
+    def action(self, action_space, observation, info=None):
+        return table_action(self.greedy_table, action_space, observation)
+
+    def batch_action(self, observations, can_double):
+        index = observations.astype(np.intp)
+        return self.greedy_table[index[:, 0], index[:, 1], index[:, 2], np.asarray(can_double, dtype=np.intp)]
+
+    def _monte_carlo_batch(self, env, rng, epsilon):
+        """Plays one batch of hands and moves each visited Q(s, a) to the average of every return seen from it"""
+        env.reset()
+        visited = []
+        while not env.terminated.all():
+            rows, states, actions = self._explore(env, rng, epsilon)
+            visited.append((rows, np.ravel_multi_index(states + (actions,), self.q.shape)))
+            env.step(self._full_actions(env, rows, actions))
+        if not visited:
+            return
+        rows = np.concatenate([rows for rows, _ in visited])
+        flat = np.concatenate([flat for _, flat in visited])
+        counts = np.bincount(flat, minlength=self.q.size)
+        returns = np.bincount(flat, weights=env.reward[rows], minlength=self.q.size)
+        q, visits = self.q.reshape(-1), self.visits.reshape(-1)
+        seen = counts > 0
+        visits[seen] += counts[seen]
+        q[seen] += (returns[seen] - counts[seen] * q[seen]) / visits[seen]
+
+    def _q_learning_batch(self, env, rng, epsilon, alpha):
+        """Plays one batch of hands, updating Q towards the one-step targets of every table after each lockstep step"""
+        env.reset()
+        q, visits = self.q.reshape(-1), self.visits.reshape(-1)
+        while not env.terminated.all():
+            rows, states, actions = self._explore(env, rng, epsilon)
+            flat = np.ravel_multi_index(states + (actions,), self.q.shape)
+            _, reward, terminated, _, _ = env.step(self._full_actions(env, rows, actions))
+            target = reward[rows]
+            going = ~terminated[rows]
+            if going.any():
+                next_rows = rows[going]
+                next_states = self._states(env, next_rows)
+                target[going] += self._legal_values(self.q[next_states], next_states[3]).max(axis=-1)
+            counts = np.bincount(flat, minlength=q.size)
+            errors = np.bincount(flat, weights=target - q[flat], minlength=q.size)
+            seen = counts > 0
+            visits[seen] += counts[seen]
+            step = alpha if alpha is not None else counts[seen] / visits[seen]
+            q[seen] += step * errors[seen] / counts[seen]
+
+    def _explore(self, env, rng, epsilon):
+        """Epsilon-greedy actions for every table still playing"""
+        rows = np.flatnonzero(~env.terminated)
+        states = self._states(env, rows)
+        actions = np.argmax(self._legal_values(self.q[states], states[3]), axis=-1)
+        explore = rng.random(len(rows)) < epsilon
+        # STAY and HIT are always legal, DOUBLE only with two cards
+        actions[explore] = rng.integers(0, 2 + states[3][explore])
+        return rows, states, actions
+
+    def _states(self, env, rows):
+        return (env.player_sum[rows], env.dealer_hand[rows, 0].astype(np.intp), env.player_soft[rows].astype(np.intp),
+                (env.player_cards[rows] == 2).astype(np.intp))
+
+    def _full_actions(self, env, rows, actions):
+        full = np.zeros(env.num_envs, dtype=np.int8)
+        full[rows] = actions
+        return full
+
+    def _legal_values(self, values, can_double):
+        """Action values with DOUBLE made unselectable where it is not legal"""
+        values = values.copy()
+        values[..., Action.DOUBLE.value] = np.where(can_double, values[..., Action.DOUBLE.value], -np.inf)
+        return values
+
+    def _path(self):
+        return f"{self.model_path}.npz"
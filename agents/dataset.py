@@ -0,0 +1,254 @@
+"""
+Offline datasets of (obs, action, reward, next_obs, done, action_mask) transitions played by an agent,
+written as shards by a pool of worker processes and read back as shuffled mini-batches.
+
+    python -m agents.dataset basic_strategy data/basic_strategy --episodes 10000000
+"""
+
+import argparse
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import gym
+import numpy as np
+
+import gym_env
+from gym_env.batch_env import BatchBlackjack
+from gym_env.enums import Action
+from gym_env.env import STAY_HIT_MASK, ALL_ACTIONS_MASK
+
+VERSION = 1
+
+# One transition in 13 bytes. Observations are small integers, so they are kept as uint8 on disk.
+TRANSITION = np.dtype([
+    ("obs", np.uint8, 3),
+    ("action", np.int8),
+    ("reward", np.float32),
+    ("next_obs", np.uint8, 3),
+    ("done", np.bool_),
+    ("action_mask", np.uint8),
+])
+
+def generate_dataset(agent_cls, name, path, episodes, workers=None, seed=None, num_decks=1, shard_size=1 << 20,
+                     num_envs=4096, compress=True, compile=False):
+    """
+    Plays an agent for a number of episodes split across a process pool and writes every decision it makes.
+    Each worker plays BatchBlackjack tables in lockstep, asks agent.batch_action for a whole batch of decisions
+    at once and writes its own shards, so nothing is gathered in the parent. Hands dealt a natural need no
+    decision and produce no transition.
+
+    Args:
+        agent_cls (type): Agent subclass, constructed in each worker as agent_cls(name, env)
+        name (str): Name passed to the agent
+        path (str): Directory of the dataset
+        episodes (int): Total number of hands
+        workers (int, optional): Number of processes. Defaults to the number of CPUs
+        seed (int, optional): Root seed of the workers' seed streams
+        num_decks (int): The number of decks in each hand's shoe
+        shard_size (int): Most transitions per shard file
+        num_envs (int): Tables each worker plays in lockstep
+        compress (bool): Write zlib compressed .npz shards instead of .npy shards, which are memory-mapped when read
+        compile (bool): Play from the agent's compiled policy table. Much faster for deterministic agents
+
+    Returns:
+        TransitionDataset
+    """
+    workers = min(workers or os.cpu_count() or 1, max(episodes, 1))
+    shares = [episodes // workers + (i < episodes % workers) for i in range(workers)]
+    seeds = np.random.SeedSequence(seed).spawn(workers)
+    os.makedirs(path, exist_ok=True)
+    for filename in os.listdir(path):
+        if filename.startswith("shard_"):
+            os.remove(os.path.join(path, filename))
+    args = [
+        (agent_cls, name, path, worker, n, s, num_decks, shard_size, num_envs, compress, compile)
+        for worker, (n, s) in enumerate(zip(shares, seeds))
+    ]
+
+    if workers == 1:
+        shards = _generate_shards(*args[0])
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_generate_shards, *a) for a in args]
+            shards = [shard for f in futures for shard in f.result()]
+
+    manifest = {
+        "version": VERSION,
+        "agent": name,
+        "episodes": episodes,
+        "num_decks": num_decks,
+        "transitions": sum(n for _, n in shards),
+        "shards": [{"file": filename, "transitions": n} for filename, n in shards],
+    }
+    with open(os.path.join(path, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=1)
+    return TransitionDataset(path)
+
+def _generate_shards(agent_cls, name, path, worker, episodes, seed_seq, num_decks, shard_size, num_envs, compress,
+                     compile):
+    """Plays one worker's share of the episodes. Returns the file name and length of every shard it wrote."""
+    env_seed, python_seed = (int(s) for s in seed_seq.generate_state(2))
+    random.seed(python_seed) # Agents such as RandomAgent use the random module
+    np.random.seed(python_seed)
+    agent = agent_cls(name, gym.make("blackjack_env-v0", verbose=False, num_decks=num_decks))
+    if compile:
+        agent.compile_policy()
+    decide = _batch_policy(agent)
+    env = BatchBlackjack(min(num_envs, max(episodes, 1)), num_decks)
+
+    shards = []
+    buffer = np.zeros(shard_size, dtype=TRANSITION)
+    n = 0
+    played = 0
+    env.reset(seed=env_seed)
+    while played < episodes:
+        if played:
+            env.reset()
+        tables = min(env.num_envs, episodes - played)
+        active = ~env.terminated
+        active[tables:] = False # The last batch plays only the hands left
+        while active.any():
+            rows = np.flatnonzero(active)
+            obs = env.observation[rows].astype(np.uint8)
+            can_double = env.player_cards[rows] == 2
+            masks = np.where(can_double, ALL_ACTIONS_MASK, STAY_HIT_MASK).astype(np.uint8)
+            chosen = np.asarray(decide(env.observation[rows], can_double), dtype=np.int8)
+            chosen[(masks >> chosen & 1) == 0] = Action.HIT.value # Same as the agents' fallback for illegal actions
+            actions = np.full(env.num_envs, Action.STAY.value, dtype=np.int8)
+            actions[rows] = chosen
+            _, reward, terminated, _, _ = env.step(actions)
+
+            done = terminated[rows]
+            step = np.zeros(len(rows), dtype=TRANSITION)
+            step["obs"] = obs
+            step["action"] = chosen
+            step["reward"] = reward[rows]
+            step["next_obs"] = env.observation[rows]
+            step["done"] = done
+            step["action_mask"] = masks
+            written = 0
+            while written < len(step):
+                k = min(len(step) - written, shard_size - n)
+                buffer[n:n + k] = step[written:written + k]
+                n += k
+                written += k
+                if n == shard_size:
+                    shards.append(_write_shard(path, worker, len(shards), buffer[:n], compress))
+                    n = 0
+            active[rows[done]] = False
+        played += tables
+    if n:
+        shards.append(_write_shard(path, worker, len(shards), buffer[:n], compress))
+    return shards
+
+def _batch_policy(agent):
+    """agent.batch_action, or a vectorized lookup when the agent plays from a compiled policy table"""
+    if agent.policy_table is None:
+        return agent.batch_action
+    table = agent.policy_table
+    def decide(observations, can_double):
+        index = observations.astype(np.intp)
+        return table[index[:, 0], index[:, 1], index[:, 2], can_double.astype(np.intp)]
+    return decide
+
+def _write_shard(path, worker, k, transitions, compress):
+    filename = f"shard_{worker:03d}_{k:05d}" + (".npz" if compress else ".npy")
+    if compress:
+        np.savez_compressed(os.path.join(path, filename), transitions=transitions)
+    else:
+        np.save(os.path.join(path, filename), transitions)
+    return filename, len(transitions)
+
+class TransitionDataset:
+    """
+    Reads a dataset written by generate_dataset. Uncompressed shards are memory-mapped and compressed ones are
+    inflated one at a time, so at most a few shards are ever held in memory.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "manifest.json")) as f:
+            self.manifest = json.load(f)
+        if self.manifest["version"] != VERSION:
+            raise ValueError(f"{path} was written by an incompatible dataset version")
+        self.shards = self.manifest["shards"]
+
+    def __len__(self):
+        return self.manifest["transitions"]
+
+    def shard(self, k):
+        """The k-th shard as a TRANSITION array"""
+        filename = os.path.join(self.path, self.shards[k]["file"])
+        if filename.endswith(".npz"):
+            with np.load(filename) as data:
+                return data["transitions"]
+        return np.load(filename, mmap_mode="r")
+
+    def batches(self, batch_size=256, shuffle=True, seed=None, shuffle_shards=4, drop_last=False):
+        """
+        Yields mini-batches as dicts of arrays, with observations as float32 like the env's.
+        Shuffling visits the shards in random order and permutes the transitions of shuffle_shards shards at a time,
+        so memory use is bounded by that window rather than the size of the dataset.
+
+        Args:
+            batch_size (int): Transitions per batch
+            shuffle (bool): Shuffle the transitions
+            seed (int, optional): Seed of the shuffle
+            shuffle_shards (int): Shards mixed together at a time when shuffling
+            drop_last (bool): Skip the final batch if it is smaller than batch_size
+        """
+        rng = np.random.default_rng(seed)
+        order = rng.permutation(len(self.shards)) if shuffle else np.arange(len(self.shards))
+        window = shuffle_shards if shuffle else 1
+        leftover = np.zeros(0, dtype=TRANSITION)
+        for start in range(0, len(order), window):
+            transitions = np.concatenate([leftover] + [self.shard(k) for k in order[start:start + window]])
+            if shuffle:
+                transitions = transitions[rng.permutation(len(transitions))]
+            end = len(transitions) - len(transitions) % batch_size
+            for i in range(0, end, batch_size):
+                yield _batch(transitions[i:i + batch_size])
+            leftover = transitions[end:]
+        if len(leftover) and not drop_last:
+            yield _batch(leftover)
+
+def _batch(transitions):
+    return {
+        "obs": transitions["obs"].astype(np.float32),
+        "action": transitions["action"].astype(np.int64),
+        "reward": np.array(transitions["reward"]),
+        "next_obs": transitions["next_obs"].astype(np.float32),
+        "done": np.array(transitions["done"]),
+        "action_mask": np.array(transitions["action_mask"]),
+    }
+
+def main(argv=None):
+    from agents.tournament import AGENTS, agent_class
+
+    parser = argparse.ArgumentParser(description="Write an offline dataset of an agent's transitions")
+    parser.add_argument("agent", choices=sorted(AGENTS), help="Agent that plays the hands")
+    parser.add_argument("path", help="Directory of the dataset")
+    parser.add_argument("--episodes", type=int, default=1000000, help="Hands to play")
+    parser.add_argument("--workers", type=int, help="Processes. Defaults to the number of CPUs")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--num-decks", type=int, default=1)
+    parser.add_argument("--shard-size", type=int, default=1 << 20, help="Most transitions per shard")
+    parser.add_argument("--num-envs", type=int, default=4096, help="Tables each worker plays in lockstep")
+    parser.add_argument("--no-compress", action="store_true", help="Write .npy shards that are memory-mapped when read")
+    parser.add_argument("--compile", action="store_true", help="Play from the agent's compiled policy table")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    dataset = generate_dataset(
+        agent_class(args.agent), args.agent, args.path, args.episodes, args.workers, args.seed, args.num_decks,
+        args.shard_size, args.num_envs, not args.no_compress, args.compile,
+    )
+    seconds = time.perf_counter() - start
+    print(f"{len(dataset)} transitions in {len(dataset.shards)} shards, {seconds:.1f}s ({len(dataset) / seconds:,.0f}/s)")
+    return dataset
+
+if __name__ == "__main__":
+    main()
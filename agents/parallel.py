@@ -0,0 +1,110 @@
+"""Evaluates an agent over many episodes on a pool of worker processes"""
+
+import os
+import pickle
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+import gym
+import numpy as np
+
+import gym_env
+from gym_env.enums import Action
+from agents.stats import StreamingStats
+
+class EvaluationResult:
+    """
+    Compact aggregate of an evaluation: StreamingStats of the episodes, with how often each action was taken and
+    the units wagered, and the reward of every episode only when they were asked for
+    """
+
+    def __init__(self, stats, rewards=None):
+        self.stats = stats
+        self.rewards = rewards
+
+    @property
+    def episodes(self):
+        return self.stats.episodes
+
+    @property
+    def action_counts(self):
+        return self.stats.action_counts
+
+    @property
+    def wagered(self):
+        return self.stats.wagered
+
+    def mean(self):
+        """Average reward per episode"""
+        return self.stats.mean
+
+    @classmethod
+    def merge(cls, results):
+        """Combines the results of several shards, in order"""
+        stats = StreamingStats()
+        rewards = []
+        for result in results:
+            stats.merge(result.stats)
+            rewards.append(result.rewards)
+        if not rewards or any(r is None for r in rewards):
+            return cls(stats)
+        return cls(stats, np.concatenate(rewards))
+
+def evaluate_parallel(agent, episodes, workers=None, seed=None, env_kwargs=None, rewards=False):
+    """
+    Runs an agent for a number of episodes split across a process pool.
+    Each worker plays a copy of the agent, with everything its constructor and training set up, on its own
+    blackjack_env-v0 seeded from its own child of one SeedSequence, so a run is reproducible for a given seed and
+    number of workers. Workers send back StreamingStats, so the memory used does not grow with the episodes
+    unless rewards is set.
+
+    Args:
+        agent (Agent): Agent to evaluate. It is pickled once and left untouched
+        episodes (int): Total number of episodes
+        workers (int, optional): Number of processes. Defaults to the number of CPUs
+        seed (int, optional): Root seed of the workers' seed streams
+        env_kwargs (dict, optional): Extra arguments for gym.make
+        rewards (bool): Also send back the reward of every episode
+
+    Returns:
+        EvaluationResult merged over every worker
+    """
+    workers = min(workers or os.cpu_count() or 1, max(episodes, 1))
+    shards = [episodes // workers + (i < episodes % workers) for i in range(workers)]
+    seeds = np.random.SeedSequence(seed).spawn(workers)
+    env_kwargs = env_kwargs or {}
+    pickled = pickle.dumps(agent) # See Agent.__getstate__
+
+    if workers == 1:
+        return _evaluate_shard(pickled, shards[0], seeds[0], env_kwargs, rewards)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(_evaluate_shard, pickled, n, s, env_kwargs, rewards) for n, s in zip(shards, seeds)
+        ]
+        return EvaluationResult.merge(f.result() for f in futures)
+
+def _evaluate_shard(pickled, episodes, seed_seq, env_kwargs, keep_rewards):
+    """Plays one worker's share of the episodes without rendering"""
+    env_seed, python_seed = (int(s) for s in seed_seq.generate_state(2))
+    random.seed(python_seed) # Agents such as RandomAgent use the random module
+    np.random.seed(python_seed)
+    env = gym.make("blackjack_env-v0", **{"verbose": False, **env_kwargs})
+    agent = pickle.loads(pickled)
+    agent.bind_env(env)
+    action = agent.action if agent.policy_table is None else agent._table_action
+
+    stats = StreamingStats()
+    action_counts = stats.action_counts
+    rewards = np.zeros(episodes, dtype=np.float32) if keep_rewards else None
+    for episode in range(episodes):
+        bet = agent.bet()
+        env.reset(seed=env_seed if episode == 0 else None, options={"bet": bet})
+        while not env.terminated:
+            act = action(env.legal_moves, env.observation)
+            action_counts[Action(act).value] += 1
+            env.step(act)
+        stats.update(env.reward, bet)
+        if keep_rewards:
+            rewards[episode] = env.reward
+    env.close()
+    return EvaluationResult(stats, rewards)
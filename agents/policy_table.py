@@ -0,0 +1,34 @@
+"""Dense lookup tables of an agent's policy, indexed by the observation"""
+
+import numpy as np
+
+from gym_env.enums import Action
+
+PLAYER_SUMS = range(3, 22)
+DEALER_CARDS = range(2, 12)
+ACTIONS = tuple(Action)
+
+# Table axes: player sum, dealer show card, usable ace, whether DOUBLE is legal
+TABLE_SHAPE = (PLAYER_SUMS.stop, DEALER_CARDS.stop, 2, 2)
+
+def policy_states():
+    """Every observation the policy can be asked about and whether DOUBLE is legal in it"""
+    grid = np.stack(np.meshgrid(PLAYER_SUMS, DEALER_CARDS, range(2), range(2), indexing="ij"), axis=-1).reshape(-1, 4)
+    return grid[:, :3].astype(np.float32), grid[:, 3].astype(bool)
+
+def compile_policy(agent):
+    """
+    Queries the agent on every state in a single batch and stores its actions in a table of Action values.
+    Only meaningful for deterministic policies.
+    """
+    observations, can_double = policy_states()
+    actions = agent.batch_action(observations, can_double)
+    table = np.full(TABLE_SHAPE, Action.STAY.value, dtype=np.int8)
+    index = observations.astype(np.intp)
+    table[index[:, 0], index[:, 1], index[:, 2], can_double.astype(np.intp)] = actions
+    return table
+
+def table_action(table, action_space, observation):
+    """Looks up the action for an observation"""
+    player_sum, dealer_card, usable_ace = observation[:3] # Any count features follow the first three
+    return ACTIONS[table[int(player_sum), int(dealer_card), int(usable_ace), int(Action.DOUBLE in action_space)]]
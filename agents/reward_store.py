@@ -0,0 +1,210 @@
+"""Chunked, memory-mapped on-disk log of every episode's reward and action counts, and decimated plotting of it"""
+
+import json
+import math
+import os
+
+import numpy as np
+
+from gym_env.enums import Action
+
+VERSION = 1
+
+class RewardStore:
+    """
+    Appends each episode's reward (float32) and how often it took each action (uint8) to .npy chunk files in a
+    directory. Chunks are preallocated memory maps of chunk_size episodes, so memory use does not grow with the
+    run, and meta.json records how many episodes are valid. A finished store can be reopened read-only.
+    """
+
+    def __init__(self, path, mode="w", chunk_size=1 << 20):
+        """
+        Args:
+            path (str): Directory of the store
+            mode (str): "w" to start a new store, "a" to append to one, "r" to read one
+            chunk_size (int): Episodes per chunk file. Taken from the store when it already exists
+        """
+        self.path = path
+        self.mode = mode
+        self.chunk_size = chunk_size
+        self.episodes = 0
+        self._rewards = None
+        self._actions = None
+        self._n = 0 # Episodes in the open chunk
+        if mode == "w":
+            os.makedirs(path, exist_ok=True)
+            for name in os.listdir(path):
+                if name.startswith(("rewards_", "actions_")):
+                    os.remove(os.path.join(path, name))
+            self._write_meta()
+        elif mode in ("a", "r"):
+            with open(os.path.join(path, "meta.json")) as f:
+                meta = json.load(f)
+            if meta["version"] != VERSION:
+                raise ValueError(f"{path} was written by an incompatible reward store version")
+            self.chunk_size = meta["chunk_size"]
+            self.episodes = meta["episodes"]
+            if mode == "a" and self.episodes % self.chunk_size:
+                self._open_chunk(self.episodes // self.chunk_size, "r+")
+                self._n = self.episodes % self.chunk_size
+        else:
+            raise ValueError(f"mode must be 'w', 'a' or 'r', got {mode!r}")
+
+    def append(self, reward, action_counts=None):
+        """Adds one episode"""
+        if self._rewards is None or self._n == self.chunk_size:
+            self._next_chunk()
+        self._rewards[self._n] = reward
+        if action_counts is not None:
+            self._actions[self._n] = action_counts
+        self._n += 1
+        self.episodes += 1
+
+    def extend(self, rewards, action_counts=None):
+        """Adds many episodes at once. action_counts, if given, has one row of counts per episode."""
+        rewards = np.asarray(rewards)
+        done = 0
+        while done < len(rewards):
+            if self._rewards is None or self._n == self.chunk_size:
+                self._next_chunk()
+            n = min(len(rewards) - done, self.chunk_size - self._n)
+            self._rewards[self._n:self._n + n] = rewards[done:done + n]
+            if action_counts is not None:
+                self._actions[self._n:self._n + n] = action_counts[done:done + n]
+            self._n += n
+            self.episodes += n
+            done += n
+
+    def chunks(self):
+        """Yields the (rewards, action counts) of every chunk in order, as read-only memory maps"""
+        self.flush()
+        for k in range(math.ceil(self.episodes / self.chunk_size)):
+            n = min(self.chunk_size, self.episodes - k * self.chunk_size)
+            rewards = np.load(self._chunk_path("rewards", k), mmap_mode="r")
+            actions = np.load(self._chunk_path("actions", k), mmap_mode="r")
+            yield rewards[:n], actions[:n]
+
+    def rewards(self):
+        """Every reward as one array. Use chunks() or running_total() for runs that do not fit in memory."""
+        return np.concatenate([rewards for rewards, _ in self.chunks()] or [np.zeros(0, dtype=np.float32)])
+
+    def action_counts(self):
+        """Total number of times each action was taken"""
+        total = np.zeros(len(Action), dtype=np.int64)
+        for _, actions in self.chunks():
+            total += actions.sum(axis=0, dtype=np.int64)
+        return total
+
+    def running_total(self, points=None):
+        """
+        Running total of the rewards, starting at 0, computed chunk by chunk with prefix sums
+
+        Args:
+            points (int, optional): Decimate to about this many points, keeping each bucket's min and max
+
+        Returns:
+            x (episode numbers) and y (running totals)
+        """
+        return running_total((rewards for rewards, _ in self.chunks()), self.episodes, points)
+
+    def flush(self):
+        """Writes the open chunk and the episode count to disk"""
+        if self._rewards is not None:
+            self._rewards.flush()
+            self._actions.flush()
+        if self.mode != "r":
+            self._write_meta()
+
+    def close(self):
+        self.flush()
+        self._rewards = None
+        self._actions = None
+
+    def _next_chunk(self):
+        if self.mode == "r":
+            raise ValueError("The reward store was opened read-only")
+        if self._rewards is not None:
+            self.flush()
+        self._open_chunk(self.episodes // self.chunk_size, "w+")
+        self._n = 0
+
+    def _open_chunk(self, k, mode):
+        open_memmap = np.lib.format.open_memmap
+        if mode == "w+":
+            self._rewards = open_memmap(self._chunk_path("rewards", k), mode, np.float32, (self.chunk_size,))
+            self._actions = open_memmap(self._chunk_path("actions", k), mode, np.uint8, (self.chunk_size, len(Action)))
+        else:
+            self._rewards = open_memmap(self._chunk_path("rewards", k), mode)
+            self._actions = open_memmap(self._chunk_path("actions", k), mode)
+
+    def _chunk_path(self, kind, k):
+        return os.path.join(self.path, f"{kind}_{k:05d}.npy")
+
+    def _write_meta(self):
+        with open(os.path.join(self.path, "meta.json"), "w") as f:
+            json.dump({"version": VERSION, "chunk_size": self.chunk_size, "episodes": self.episodes}, f)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def running_total(chunks, episodes, points=None):
+    """
+    Running total of rewards given chunk by chunk, starting at 0
+
+    Args:
+        chunks (iterable): Arrays of rewards, in order
+        episodes (int): Total number of rewards in the chunks
+        points (int, optional): Decimate to about this many points. Each bucket of episodes contributes its
+            smallest and largest total, so the plotted envelope keeps every swing.
+
+    Returns:
+        x (episode numbers) and y (running totals)
+    """
+    n = episodes + 1
+    if points is None or n <= points:
+        y = np.zeros(n)
+        offset = 0
+        for rewards in chunks:
+            np.cumsum(rewards, dtype=np.float64, out=y[offset + 1:offset + 1 + len(rewards)])
+            y[offset + 1:offset + 1 + len(rewards)] += y[offset]
+            offset += len(rewards)
+        return np.arange(n), y
+
+    bucket = math.ceil(n / max(points // 2, 1))
+    buckets = math.ceil(n / bucket)
+    low = np.full(buckets, np.inf)
+    high = np.full(buckets, -np.inf)
+    low[0] = high[0] = 0.0 # The total before the first episode
+    offset = 1 # Index of the next total
+    carry = 0.0
+    for rewards in chunks:
+        if not len(rewards):
+            continue
+        totals = np.cumsum(rewards, dtype=np.float64)
+        totals += carry
+        carry = totals[-1]
+        first = (-offset) % bucket # Position in the chunk of the first bucket boundary
+        starts = np.arange(first, len(totals), bucket)
+        if first:
+            starts = np.concatenate([[0], starts])
+        ids = (offset + starts) // bucket
+        np.minimum.at(low, ids, np.minimum.reduceat(totals, starts))
+        np.maximum.at(high, ids, np.maximum.reduceat(totals, starts))
+        offset += len(totals)
+    x = np.repeat(np.arange(buckets) * bucket, 2)
+    y = np.column_stack([low, high]).ravel()
+    return x, y
+
+def plot_running_total(x, y, name, filename):
+    """Saves a plot of a running total, e.g. from running_total, to filename"""
+    import matplotlib.pyplot as plt # Plotting libraries are only loaded by the code that plots
+
+    plt.plot(x, y)
+    plt.xlabel("Episode")
+    plt.ylabel("Running Total")
+    plt.title(f"Running Total For {name} Agent")
+
+    plt.savefig(filename)
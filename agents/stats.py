@@ -0,0 +1,102 @@
+"""Constant-memory running statistics of an agent's results"""
+
+import math
+
+import numpy as np
+
+from gym_env.enums import Action
+
+class StreamingStats:
+    """
+    Running mean and variance of the reward per hand (Welford's algorithm), win/push/loss counts, the units
+    initially wagered and how often each action was taken. Memory use does not grow with the number of episodes.
+    """
+
+    def __init__(self):
+        self.episodes = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.wins = 0
+        self.pushes = 0
+        self.losses = 0
+        self.wagered = 0
+        self.action_counts = [0] * len(Action)
+
+    def update(self, reward, bet=1):
+        """Adds the reward of one episode, whose initial bet was bet units"""
+        self.episodes += 1
+        self.wagered += bet
+        delta = reward - self.mean
+        self.mean += delta / self.episodes
+        self.m2 += delta * (reward - self.mean)
+        if reward > 0:
+            self.wins += 1
+        elif reward < 0:
+            self.losses += 1
+        else:
+            self.pushes += 1
+
+    def update_many(self, rewards, action_counts=None, wagered=None):
+        """Adds the rewards of many episodes at once. wagered is their total initial bet, one unit each by default."""
+        rewards = np.asarray(rewards, dtype=np.float64)
+        other = StreamingStats()
+        other.episodes = len(rewards)
+        other.wagered = other.episodes if wagered is None else wagered
+        if other.episodes:
+            other.mean = float(rewards.mean())
+            other.m2 = float(((rewards - other.mean) ** 2).sum())
+        other.wins = int((rewards > 0).sum())
+        other.losses = int((rewards < 0).sum())
+        other.pushes = other.episodes - other.wins - other.losses
+        if action_counts is not None:
+            other.action_counts = [int(n) for n in action_counts]
+        self.merge(other)
+
+    def merge(self, other):
+        """Combines the statistics of another stream into this one (Chan et al.)"""
+        episodes = self.episodes + other.episodes
+        if not episodes:
+            return
+        delta = other.mean - self.mean
+        self.mean += delta * other.episodes / episodes
+        self.m2 += other.m2 + delta ** 2 * self.episodes * other.episodes / episodes
+        self.episodes = episodes
+        self.wins += other.wins
+        self.pushes += other.pushes
+        self.losses += other.losses
+        self.wagered += other.wagered
+        self.action_counts = [a + b for a, b in zip(self.action_counts, other.action_counts)]
+
+    @property
+    def variance(self):
+        """Sample variance of the reward per hand"""
+        return self.m2 / (self.episodes - 1) if self.episodes > 1 else 0.0
+
+    @property
+    def house_edge(self):
+        """Expected loss as a fraction of the units initially wagered. -mean when every hand bets one unit"""
+        return -self.mean * (self.episodes / self.wagered) if self.wagered else 0.0
+
+    def action_frequencies(self):
+        """Fraction of decisions spent on each action"""
+        total = sum(self.action_counts)
+        return {action: self.action_counts[action.value] / total if total else 0.0 for action in Action}
+
+    def confidence_interval(self, z=1.96):
+        """Confidence interval on the expected reward per hand. Defaults to 95%."""
+        if self.episodes < 2:
+            return -math.inf, math.inf
+        half_width = z * math.sqrt(self.variance / self.episodes)
+        return self.mean - half_width, self.mean + half_width
+
+    def ci_width(self, z=1.96):
+        """Width of the confidence interval on the expected reward per hand"""
+        low, high = self.confidence_interval(z)
+        return high - low
+
+    def __repr__(self):
+        low, high = self.confidence_interval()
+        return (
+            f"StreamingStats(episodes={self.episodes}, mean={self.mean:.5f}, 95% CI=({low:.5f}, {high:.5f}), "
+            f"house_edge={self.house_edge:.5f}, wins={self.wins}, pushes={self.pushes}, losses={self.losses})"
+        )
@@ -0,0 +1,204 @@
+"""
+Hyperparameter sweep of PPOAgent. Runs are trained in a process pool, each pinned to its own CPUs, and scored by
+the exact expected value of their greedy policy. Runs clearly behind the best run at the same point are pruned.
+
+    python -m agents.sweep --search random --trials 16 --timesteps 200000 --workers 4 --threads-per-run 1
+"""
+
+import argparse
+import csv
+import itertools
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# Default search space: a list is a set of choices, a (low, high) tuple is sampled log-uniformly by random_search
+SPACE = {
+    "learning_rate": [1e-4, 3e-4, 1e-3],
+    "n_steps": [512, 2048],
+    "batch_size": [64, 256],
+    "n_epochs": [5, 10],
+    "ent_coef": [0.0, 0.01],
+    "gamma": [0.99, 1.0],
+}
+
+def grid(space=SPACE):
+    """Every combination of the choices in space"""
+    names = list(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+
+def random_search(space=SPACE, trials=16, seed=None):
+    """
+    trials configurations sampled from space
+
+    Args:
+        space (dict): Hyperparameter -> list of choices, or a (low, high) tuple sampled log-uniformly
+        trials (int): Number of configurations
+        seed (int, optional): Seed of the sampling
+    """
+    rng = np.random.default_rng(seed)
+    configs = []
+    for _ in range(trials):
+        config = {}
+        for name, values in space.items():
+            if isinstance(values, tuple):
+                low, high = values
+                config[name] = float(math.exp(rng.uniform(math.log(low), math.log(high))))
+            else:
+                config[name] = values[rng.integers(len(values))]
+                config[name] = config[name].item() if isinstance(config[name], np.generic) else config[name]
+        configs.append(config)
+    return configs
+
+# Set in each worker by _init_worker
+_solver = None
+_best_scores = None
+
+def _init_worker(slot_counter, threads, best_scores):
+    """Pins the worker to its own threads CPUs and caps the threads torch uses, before torch is imported"""
+    global _solver, _best_scores
+    with slot_counter.get_lock():
+        slot = slot_counter.value
+        slot_counter.value += 1
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    if hasattr(os, "sched_setaffinity"):
+        cpus = sorted(os.sched_getaffinity(0))
+        os.sched_setaffinity(0, {cpus[(slot * threads + i) % len(cpus)] for i in range(threads)})
+    import torch
+    torch.set_num_threads(threads)
+
+    from analysis.solver import Solver
+    _solver = Solver() # Its dealer tables are shared by every run of the worker
+    _best_scores = best_scores
+
+def _make_pruning_callback(agent, eval_every, min_evals, prune_margin, history):
+    from stable_baselines3.common.callbacks import BaseCallback
+
+    class PruningCallback(BaseCallback):
+        """Scores the policy every eval_every timesteps and stops training when it is clearly behind the best run"""
+
+        def __init__(self):
+            super().__init__()
+            self.next_eval = eval_every
+            self.pruned = False
+
+        def _on_step(self):
+            return not self.pruned
+
+        def _on_rollout_end(self):
+            if self.num_timesteps < self.next_eval:
+                return
+            slot = self.num_timesteps // eval_every # Runs are compared at the same number of timesteps trained
+            self.next_eval = (slot + 1) * eval_every
+            score = _solver.agent_ev(agent)
+            history.append((self.num_timesteps, score))
+            with _best_scores.get_lock():
+                if slot < len(_best_scores):
+                    best = _best_scores[slot]
+                    _best_scores[slot] = max(best, score)
+                else:
+                    best = -np.inf
+            self.pruned = len(history) >= min_evals and score < best - prune_margin
+
+    return PruningCallback()
+
+def _run_trial(run, config, out, timesteps, n_envs, eval_every, min_evals, prune_margin):
+    """Trains and scores one configuration. Returns its row of the summary table."""
+    import gym
+    from agents.agent_ppo import PPOAgent
+
+    run_dir = os.path.join(out, f"run_{run:03d}")
+    os.makedirs(run_dir, exist_ok=True)
+    agent = PPOAgent(f"run_{run:03d}", gym.make("blackjack_env-v0", verbose=False), os.path.join(run_dir, "ppo_blackjack"))
+    history = []
+    callback = _make_pruning_callback(agent, eval_every, min_evals, prune_margin, history)
+    start = time.perf_counter()
+    stats = agent.train(timesteps, n_envs, from_scratch=True, hyperparameters={"verbose": 0, **config}, callbacks=[callback])
+    score = _solver.agent_ev(agent)
+    with open(os.path.join(run_dir, "history.csv"), "w", newline="") as f:
+        csv.writer(f).writerows([("timesteps", "score")] + history)
+    return {
+        "run": run, **config, "score": score, "timesteps": stats["timesteps"], "pruned": callback.pruned,
+        "seconds": round(time.perf_counter() - start, 1),
+    }
+
+def run_sweep(configs, out="sweeps/ppo", timesteps=200000, n_envs=8, workers=None, threads_per_run=1,
+              eval_every=20000, min_evals=2, prune_margin=0.02):
+    """
+    Trains a PPOAgent from scratch for every configuration and writes the summary table to out/summary.csv.
+    Each run is scored by the exact expected reward per hand of its greedy policy (analysis.solver), computed
+    from one batched forward pass over every state, so scores are free of sampling noise.
+
+    Args:
+        configs (list): Dicts of PPO keyword arguments, e.g. from grid or random_search
+        out (str): Directory of the runs' models and the summary
+        timesteps (int): Timesteps per run
+        n_envs (int): Environment copies per run
+        workers (int, optional): Runs trained at once. Defaults to the number of CPUs // threads_per_run
+        threads_per_run (int): CPUs each run is pinned to and torch threads it uses
+        eval_every (int): Timesteps between scores of a run
+        min_evals (int): Scores before a run can be pruned
+        prune_margin (float): How far, in expected reward per hand, a run may trail the best score seen at the
+            same point before it is pruned
+
+    Returns:
+        list of the summary rows, best score first
+    """
+    workers = workers or max((os.cpu_count() or 1) // threads_per_run, 1)
+    os.makedirs(out, exist_ok=True)
+    slot_counter = multiprocessing.Value("i", 0)
+    best_scores = multiprocessing.Array("d", [-np.inf] * (timesteps // eval_every + 1))
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(slot_counter, threads_per_run, best_scores)) as pool:
+        futures = [
+            pool.submit(_run_trial, run, config, out, timesteps, n_envs, eval_every, min_evals, prune_margin)
+            for run, config in enumerate(configs)
+        ]
+        rows = [f.result() for f in futures]
+
+    rows.sort(key=lambda row: -row["score"])
+    names = list(dict.fromkeys(name for row in rows for name in row)) # Every column, in order of appearance
+    with open(os.path.join(out, "summary.csv"), "w", newline="") as f:
+        writer = csv.DictWriter(f, names)
+        writer.writeheader()
+        writer.writerows(rows)
+    return rows
+
+def format_summary(rows):
+    """The summary rows as an aligned text table"""
+    names = list(dict.fromkeys(name for row in rows for name in row))
+    cells = [[f"{row.get(name, ''):.5f}" if name == "score" else str(row.get(name, "")) for name in names] for row in rows]
+    widths = [max(len(name), *(len(cell[i]) for cell in cells)) for i, name in enumerate(names)]
+    lines = ["  ".join(name.ljust(width) for name, width in zip(names, widths))]
+    lines += ["  ".join(cell.ljust(width) for cell, width in zip(row, widths)) for row in cells]
+    return "\n".join(lines)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sweep PPO hyperparameters")
+    parser.add_argument("--search", choices=["grid", "random"], default="random")
+    parser.add_argument("--trials", type=int, default=16, help="Configurations of a random search")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of a random search")
+    parser.add_argument("--out", default="sweeps/ppo", help="Directory of the runs and summary.csv")
+    parser.add_argument("--timesteps", type=int, default=200000, help="Timesteps per run")
+    parser.add_argument("--n-envs", type=int, default=8, help="Environment copies per run")
+    parser.add_argument("--workers", type=int, help="Runs trained at once")
+    parser.add_argument("--threads-per-run", type=int, default=1, help="CPUs and torch threads per run")
+    parser.add_argument("--eval-every", type=int, default=20000, help="Timesteps between scores")
+    parser.add_argument("--min-evals", type=int, default=2, help="Scores before a run can be pruned")
+    parser.add_argument("--prune-margin", type=float, default=0.02, help="Expected reward a run may trail the best by")
+    args = parser.parse_args(argv)
+
+    configs = grid() if args.search == "grid" else random_search(trials=args.trials, seed=args.seed)
+    rows = run_sweep(
+        configs, args.out, args.timesteps, args.n_envs, args.workers, args.threads_per_run,
+        args.eval_every, args.min_evals, args.prune_margin,
+    )
+    print(format_summary(rows))
+    return rows
+
+if __name__ == "__main__":
+    main()
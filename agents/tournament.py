@@ -0,0 +1,158 @@
+"""
+Head-to-head comparison of agents with common random numbers: every agent plays the same seeded hands.
+
+    python -m agents.tournament basic_strategy never_bust random --hands 100000 --until-significant
+"""
+
+import argparse
+import importlib
+import itertools
+import random
+
+import gym
+import numpy as np
+
+import gym_env
+from agents.stats import StreamingStats
+
+# Agents the CLI knows, imported only when picked. CountingAgent is left out: the tournament deals every hand from a
+# fresh shoe and never asks for a bet, so it could neither count nor spread its bets
+AGENTS = {
+    "random": "agents.agent_random:RandomAgent",
+    "never_bust": "agents.agent_never_bust:NeverBustAgent",
+    "basic_strategy": "agents.agent_basic_strategy:BasicStrategyAgent",
+    "tabular": "agents.agent_tabular:TabularAgent",
+    "ppo_agent": "agents.agent_ppo:PPOAgent",
+    "ppo_numpy": "agents.agent_numpy:NumpyPolicyAgent",
+}
+
+def agent_class(name):
+    """Imports the agent class registered under name"""
+    module, cls = AGENTS[name].split(":")
+    return getattr(importlib.import_module(module), cls)
+
+class TournamentResult:
+    """
+    Rewards of every agent on the same hands. Each pair of agents is compared on its per-hand reward differences,
+    whose variance is far lower than that of two independent runs when the agents play alike.
+    """
+
+    def __init__(self, names):
+        self.names = list(names)
+        self.stats = {name: StreamingStats() for name in self.names}
+        self.differences = {pair: StreamingStats() for pair in itertools.permutations(self.names, 2)}
+
+    @property
+    def hands(self):
+        return self.stats[self.names[0]].episodes
+
+    def update(self, rewards):
+        """Adds a (hands, agents) array of rewards"""
+        for i, name in enumerate(self.names):
+            self.stats[name].update_many(rewards[:, i])
+        for a, b in self.differences:
+            self.differences[a, b].update_many(rewards[:, self.names.index(a)] - rewards[:, self.names.index(b)])
+
+    def difference(self, a, b):
+        """Statistics of the per-hand reward of a minus that of b"""
+        return self.differences[a, b]
+
+    def ranking(self):
+        """Agent names, best mean reward first"""
+        return sorted(self.names, key=lambda name: -self.stats[name].mean)
+
+    def significant(self, z=1.96):
+        """Whether every agent beats the next one in the ranking with confidence, i.e. no difference CI contains 0"""
+        ranking = self.ranking()
+        return all(self.difference(a, b).confidence_interval(z)[0] > 0 for a, b in zip(ranking, ranking[1:]))
+
+    def variance_reduction(self, a, b):
+        """
+        How many times fewer hands pairing needs than independent runs for the same confidence interval
+        on the difference between a and b
+        """
+        paired = self.difference(a, b).variance
+        independent = self.stats[a].variance + self.stats[b].variance
+        return independent / paired if paired else np.inf
+
+    def report(self, z=1.96):
+        """Human readable ranking and pairwise comparisons"""
+        lines = [f"{self.hands} hands per agent"]
+        for name in self.ranking():
+            low, high = self.stats[name].confidence_interval(z)
+            lines.append(f"  {name:<16} {self.stats[name].mean:>9.5f}  CI ({low:.5f}, {high:.5f})")
+        ranking = self.ranking()
+        for a, b in itertools.combinations(ranking, 2):
+            diff = self.difference(a, b)
+            low, high = diff.confidence_interval(z)
+            verdict = "significant" if low > 0 or high < 0 else "not significant"
+            lines.append(
+                f"  {a} - {b}: {diff.mean:.5f} CI ({low:.5f}, {high:.5f}) {verdict}, "
+                f"{self.variance_reduction(a, b):.1f}x fewer hands than independent runs"
+            )
+        return "\n".join(lines)
+
+def run_tournament(agents, hands=100000, seed=0, until_significant=False, min_hands=1000, check_every=1000, z=1.96):
+    """
+    Plays every agent on the same sequence of hands. Hand i is dealt from a fresh shoe shuffled with the i-th seed of
+    one stream, and the random module is reseeded with it too, so randomized agents also share their random numbers.
+
+    Args:
+        agents (list): Agents, each playing on its own env
+        hands (int): Number of hands, or the maximum number when until_significant is set
+        seed (int): Seed of the hand sequence
+        until_significant (bool): Stop once the ranking is significant
+        min_hands (int): Hands to play before the stopping rule is checked
+        check_every (int): Hands between checks of the stopping rule
+        z (float): Critical value of the confidence intervals. Defaults to 95%
+
+    Returns:
+        TournamentResult
+    """
+    result = TournamentResult(agent.name for agent in agents)
+    rng = np.random.default_rng(seed)
+    played = 0
+    while played < hands:
+        batch = min(check_every, hands - played)
+        hand_seeds = rng.integers(2 ** 32, size=batch)
+        rewards = np.zeros((batch, len(agents)))
+        for j, agent in enumerate(agents):
+            action = agent.action if agent.policy_table is None else agent._table_action
+            for i, hand_seed in enumerate(hand_seeds):
+                rewards[i, j] = _play_hand(agent.env, action, int(hand_seed))
+        result.update(rewards)
+        played += batch
+        if until_significant and played >= min_hands and result.significant(z):
+            break
+    return result
+
+def _play_hand(env, action, hand_seed):
+    random.seed(hand_seed)
+    env.reset(seed=hand_seed)
+    while not env.terminated:
+        env.step(action(env.legal_moves, env.observation))
+    return env.reward
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare agents on the same hands")
+    parser.add_argument("agents", nargs="+", choices=sorted(AGENTS), help="Agents to compare")
+    parser.add_argument("--hands", type=int, default=100000, help="Hands per agent, or the maximum with --until-significant")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the hand sequence")
+    parser.add_argument("--until-significant", action="store_true", help="Stop once the ranking is significant")
+    parser.add_argument("--min-hands", type=int, default=1000, help="Hands before the stopping rule is checked")
+    parser.add_argument("--num-decks", type=int, default=1, help="Decks in each hand's shoe")
+    parser.add_argument("--compile", action="store_true", help="Play every agent from its compiled policy table")
+    args = parser.parse_args(argv)
+
+    agents = []
+    for name in args.agents:
+        agent = agent_class(name)(name, gym.make("blackjack_env-v0", verbose=False, num_decks=args.num_decks))
+        if args.compile:
+            agent.compile_policy()
+        agents.append(agent)
+    result = run_tournament(agents, args.hands, args.seed, args.until_significant, args.min_hands)
+    print(result.report())
+    return result
+
+if __name__ == "__main__":
+    main()
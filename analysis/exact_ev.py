@@ -0,0 +1,277 @@
+"""Exact composition-dependent expected values of the player's actions"""
+
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+
+from gym_env.enums import Action
+from gym_env.shoe import CARD_VALUES
+
+# A composition is a tuple of how many cards of each value 2-11 are left. Index 8 holds every ten-valued card.
+VALUES = tuple(range(2, 12))
+TEN = VALUES.index(10)
+ACE = VALUES.index(11)
+
+# Dealer outcomes are probabilities of finishing on 17, 18, 19, 20, 21 or busting
+DEALER_TOTALS = (17, 18, 19, 20, 21)
+BUST = len(DEALER_TOTALS)
+
+def _stands(total):
+    outcomes = [0.0] * (len(DEALER_TOTALS) + 1)
+    outcomes[BUST if total > 21 else max(total - 17, 0)] = 1.0
+    return tuple(outcomes)
+
+# Distribution of a dealer who stands on each total 0-22, 22 meaning any bust. Below 17 only an exhausted
+# composition stands, which counts as 17
+_STANDS = tuple(_stands(total) for total in range(23))
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+def composition(cards):
+    """Composition of an iterable of card codes"""
+    counts = np.bincount(np.asarray(CARD_VALUES)[np.asarray(cards, dtype=np.int64)], minlength=12)
+    return tuple(int(n) for n in counts[2:])
+
+def full_composition(num_decks=1):
+    """Composition of a complete shoe"""
+    return tuple(4 * num_decks if value != 10 else 16 * num_decks for value in VALUES)
+
+def unseen_composition(env):
+    """Composition of the cards the player cannot see: the undealt shoe plus the dealer's hole card"""
+    unseen = list(env.shoe.remaining())
+    if not env.terminated:
+        unseen.append(env.dealer_hand[1])
+    return composition(unseen)
+
+class LRUCache:
+    """Bounded mapping that evicts the least recently used entry"""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+
+    def get(self, key):
+        """Returns the cached value or None"""
+        value = self._data.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._data.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self._data[key] = value
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self):
+        self._data.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def info(self):
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self._data))
+
+class ExactEV:
+    """
+    Computes the exact expected value of STAY, HIT and DOUBLE under the rules of gym_env.env.Blackjack:
+    dealer stands on all 17s, ties push and doubling is only allowed on the first two cards.
+    The dealer's hand is already known not to be a blackjack when the player acts, since the env ends those hands at once.
+    Dealer final-total distributions are cached by up-card and composition. The dealer's draws below them and the
+    values of hitting are cached too, so they are shared by every hit branch, decision and hand of a shoe instead of
+    being recomputed for each query.
+    """
+
+    def __init__(self, cache_size=100000, play_cache_size=200000):
+        """
+        Args:
+            cache_size (int): Maximum number of dealer distributions kept in the cache
+            play_cache_size (int): Maximum number of the dealer's partial hands, and separately of the player's hit
+                values, kept in their caches. A full dealer play cache takes about 100 MB at the default
+        """
+        self.dealer_cache = LRUCache(cache_size)
+        self.dealer_play_cache = LRUCache(play_cache_size)
+        self.hit_cache = LRUCache(play_cache_size)
+
+    def action_values(self, player_sum, usable_ace, dealer_card, comp, can_double=True):
+        """
+        Expected value of every legal action, in units of the initial bet
+
+        Args:
+            player_sum (int): The player's total
+            usable_ace (bool): Whether the player's hand counts an ace as 11
+            dealer_card (int): Value of the dealer's show card, 2-11
+            comp (tuple): Composition of the unseen cards, including the dealer's hole card
+            can_double (bool): Whether the player still has two cards
+
+        Returns:
+            dict mapping each Action to its expected value
+        """
+        player_sum, usable_ace, dealer_card = int(player_sum), bool(usable_ace), int(dealer_card)
+        hard = player_sum - 10 * usable_ace
+        values = {
+            Action.STAY: self._stay(player_sum, dealer_card, comp),
+            Action.HIT: self._hit(hard, usable_ace, dealer_card, comp),
+        }
+        if can_double:
+            values[Action.DOUBLE] = self._double(hard, usable_ace, dealer_card, comp)
+        return values
+
+    def evaluate(self, env):
+        """Expected value of every legal action in the env's current hand"""
+        player_sum, dealer_card, usable_ace = env.observation[:3] # Any count features follow the first three
+        return self.action_values(
+            player_sum, usable_ace, dealer_card, unseen_composition(env), can_double=len(env.player_hand) == 2
+        )
+
+    def dealer_outcomes(self, dealer_card, comp):
+        """
+        Distribution of the dealer's final total given the show card, conditioned on the dealer not having blackjack
+
+        Args:
+            dealer_card (int): Value of the dealer's show card, 2-11
+            comp (tuple): Composition of the unseen cards, including the dealer's hole card
+
+        Returns:
+            np.ndarray of the probabilities of finishing on 17, 18, 19, 20, 21 and busting
+        """
+        key = (dealer_card, comp)
+        outcomes = self.dealer_cache.get(key)
+        if outcomes is not None:
+            return outcomes
+
+        blackjack = _blackjack_index(dealer_card)
+        outcomes = np.zeros(len(DEALER_TOTALS) + 1)
+        weight = 0
+        for i, n in enumerate(comp):
+            if n == 0 or i == blackjack:
+                continue
+            hole = VALUES[i]
+            hard = _hard_value(dealer_card) + _hard_value(hole)
+            outcomes += np.multiply(n, self._dealer_play(hard, dealer_card == 11 or hole == 11, _remove(comp, i)))
+            weight += n
+        if weight:
+            outcomes /= weight
+        outcomes.flags.writeable = False
+
+        self.dealer_cache.put(key, outcomes)
+        return outcomes
+
+    def _stay(self, player_sum, dealer_card, comp):
+        if player_sum > 21:
+            return -1.0
+        outcomes = self.dealer_outcomes(dealer_card, comp)
+        win = outcomes[BUST]
+        lose = 0.0
+        for total, p in zip(DEALER_TOTALS, outcomes):
+            if player_sum > total:
+                win += p
+            elif player_sum < total:
+                lose += p
+        return float(win - lose)
+
+    def _hit(self, hard, ace, dealer_card, comp):
+        """Value of hitting and then playing the rest of the hand optimally"""
+        key = (hard, ace, dealer_card, comp)
+        value = self.hit_cache.get(key)
+        if value is not None:
+            return value
+        value = 0.0
+        for i, p in _player_draws(dealer_card, comp):
+            new_hard, new_ace = hard + _hard_value(VALUES[i]), ace or i == ACE
+            total = _total(new_hard, new_ace)
+            if total > 21:
+                value -= p
+                continue
+            rest = _remove(comp, i)
+            best = self._stay(total, dealer_card, rest)
+            if total < 21:
+                best = max(best, self._hit(new_hard, new_ace, dealer_card, rest))
+            value += p * best
+        self.hit_cache.put(key, value)
+        return value
+
+    def _double(self, hard, ace, dealer_card, comp):
+        """Value of doubling the bet and taking exactly one card"""
+        value = 0.0
+        for i, p in _player_draws(dealer_card, comp):
+            total = _total(hard + _hard_value(VALUES[i]), ace or i == ACE)
+            value += p * self._stay(total, dealer_card, _remove(comp, i))
+        return 2 * value
+
+    def _dealer_play(self, hard, ace, comp):
+        """
+        Distribution of the dealer's final total when drawing from comp until reaching 17, as a tuple.
+        Tuples of six floats are cheaper to accumulate than NumPy arrays this small.
+        """
+        total = _total(hard, ace)
+        if total >= 17 or not any(comp): # An exhausted composition is treated as the dealer standing on 17
+            return _STANDS[min(total, 22)]
+        key = (hard, ace, comp)
+        outcomes = self.dealer_play_cache.get(key)
+        if outcomes is not None:
+            return outcomes
+        cards = sum(comp)
+        o17 = o18 = o19 = o20 = o21 = bust = 0.0
+        for i, n in enumerate(comp):
+            if not n:
+                continue
+            new_hard, new_ace = hard + _hard_value(VALUES[i]), ace or i == ACE
+            new_total = _total(new_hard, new_ace)
+            p = n / cards
+            if new_total < 17:
+                d17, d18, d19, d20, d21, dbust = self._dealer_play(new_hard, new_ace, _remove(comp, i))
+                o17 += p * d17
+                o18 += p * d18
+                o19 += p * d19
+                o20 += p * d20
+                o21 += p * d21
+                bust += p * dbust
+            elif new_total > 21: # Settled here rather than in a call per card, since most draws end the hand
+                bust += p
+            elif new_total == 17:
+                o17 += p
+            elif new_total == 18:
+                o18 += p
+            elif new_total == 19:
+                o19 += p
+            elif new_total == 20:
+                o20 += p
+            else:
+                o21 += p
+        outcomes = (o17, o18, o19, o20, o21, bust)
+        self.dealer_play_cache.put(key, outcomes)
+        return outcomes
+
+def _hard_value(value):
+    return 1 if value == 11 else value
+
+def _total(hard, ace):
+    """Best total of a hand with the given hard total"""
+    return hard + 10 if ace and hard + 10 <= 21 else hard
+
+def _remove(comp, i):
+    return comp[:i] + (comp[i] - 1,) + comp[i + 1:]
+
+def _blackjack_index(dealer_card):
+    """Index of the hole card that would give the dealer blackjack"""
+    if dealer_card == 11:
+        return TEN
+    if dealer_card == 10:
+        return ACE
+    return None
+
+def _player_draws(dealer_card, comp):
+    """
+    Probability of each card the player can draw next. The dealer's hole card is one of the unseen cards,
+    so when it is known not to complete a blackjack, drawing that card becomes slightly more likely.
+    """
+    total = sum(comp)
+    blackjack = _blackjack_index(dealer_card)
+    not_blackjack = total - 1 - (comp[blackjack] if blackjack is not None else 0)
+    weights = [n * (not_blackjack + (i == blackjack)) for i, n in enumerate(comp)]
+    norm = sum(weights)
+    return [(i, w / norm) for i, w in enumerate(weights) if w]
@@ -0,0 +1,191 @@
+"""Exact infinite-deck solution of the game: the optimal strategy and the expected value of any policy"""
+
+import numpy as np
+
+from agents.policy_table import PLAYER_SUMS, DEALER_CARDS, TABLE_SHAPE, compile_policy
+from analysis.exact_ev import VALUES, TEN, ACE, DEALER_TOTALS, BUST, _blackjack_index, _hard_value, _total
+from gym_env.enums import Action
+
+# Probability of drawing each value 2-11 from an infinite deck
+CARD_PROBS = tuple(4 / 13 if i == TEN else 1 / 13 for i in range(len(VALUES)))
+
+class Solver:
+    """
+    Solves the rules of gym_env.env.Blackjack for an infinite deck by memoized recursion over
+    (player total, soft, dealer show card): dealer stands on 17, doubling is only allowed on the first two cards
+    and a player blackjack is paid at once, even against a dealer blackjack.
+    The dealer's hand is already known not to be a blackjack when the player acts.
+    """
+
+    def __init__(self, blackjack_payout=1.5, hit_soft_17=False):
+        """
+        Args:
+            blackjack_payout (float): What a player blackjack pays, in units of the bet
+            hit_soft_17 (bool): Whether the dealer hits a soft 17
+        """
+        self.blackjack_payout = blackjack_payout
+        self.hit_soft_17 = hit_soft_17
+        self._dealer_memo = {}
+        self._optimal_memo = {}
+        self.dealer = {dealer_card: self.dealer_outcomes(dealer_card) for dealer_card in DEALER_CARDS}
+        self.stay_values = np.full((PLAYER_SUMS.stop, DEALER_CARDS.stop), np.nan)
+        for player_sum in PLAYER_SUMS:
+            for dealer_card in DEALER_CARDS:
+                self.stay_values[player_sum, dealer_card] = self._stay_outcome(player_sum, self.dealer[dealer_card])
+
+    def dealer_outcomes(self, dealer_card):
+        """
+        Distribution of the dealer's final total given the show card, conditioned on the dealer not having blackjack
+
+        Args:
+            dealer_card (int): Value of the dealer's show card, 2-11
+
+        Returns:
+            np.ndarray of the probabilities of finishing on 17, 18, 19, 20, 21 and busting
+        """
+        blackjack = _blackjack_index(dealer_card)
+        outcomes = np.zeros(len(DEALER_TOTALS) + 1)
+        for i, p in enumerate(CARD_PROBS):
+            if i != blackjack:
+                hard = _hard_value(dealer_card) + _hard_value(VALUES[i])
+                outcomes += p * self._dealer_play(hard, dealer_card == 11 or i == ACE)
+        return outcomes / outcomes.sum()
+
+    def action_values(self, player_sum, usable_ace, dealer_card, can_double=True):
+        """
+        Expected value of every legal action when the rest of the hand is played optimally, in units of the initial bet
+
+        Args:
+            player_sum (int): The player's total
+            usable_ace (bool): Whether the player's hand counts an ace as 11
+            dealer_card (int): Value of the dealer's show card, 2-11
+            can_double (bool): Whether the player still has two cards
+
+        Returns:
+            dict mapping each Action to its expected value
+        """
+        player_sum, usable_ace, dealer_card = int(player_sum), bool(usable_ace), int(dealer_card)
+        hard = player_sum - 10 * usable_ace
+        values = {
+            Action.STAY: self._stay(player_sum, dealer_card),
+            Action.HIT: self._hit(hard, usable_ace, dealer_card, None, self._optimal_memo),
+        }
+        if can_double:
+            values[Action.DOUBLE] = self._double(hard, usable_ace, dealer_card)
+        return values
+
+    def optimal_policy(self):
+        """The optimal action in every state, as a policy table (see agents.policy_table)"""
+        table = np.full(TABLE_SHAPE, Action.STAY.value, dtype=np.int8)
+        for player_sum in PLAYER_SUMS:
+            for usable_ace in range(2):
+                if usable_ace and player_sum < 12: # No such hand. Play it like the hard total.
+                    table[player_sum, :, 1] = table[player_sum, :, 0]
+                    continue
+                for dealer_card in DEALER_CARDS:
+                    for can_double in range(2):
+                        values = self.action_values(player_sum, usable_ace, dealer_card, can_double)
+                        table[player_sum, dealer_card, usable_ace, can_double] = max(values, key=values.get).value
+        return table
+
+    def expected_value(self):
+        """Expected reward per hand of optimal play"""
+        return self._hand_value(None, self._optimal_memo)
+
+    def policy_ev(self, table):
+        """
+        Exact expected reward per hand of a deterministic policy.
+        DOUBLE where it is not legal is played as HIT, like the agents do.
+
+        Args:
+            table (np.ndarray): Policy table of Action values, e.g. from agents.policy_table.compile_policy
+        """
+        return self._hand_value(np.asarray(table), {})
+
+    def agent_ev(self, agent):
+        """Exact expected reward per hand of an agent's (deterministic) policy"""
+        table = agent.policy_table if agent.policy_table is not None else compile_policy(agent)
+        return self.policy_ev(table)
+
+    def _hand_value(self, table, memo):
+        """Expected reward of a whole hand, from the deal on"""
+        natural = 2 * CARD_PROBS[ACE] * CARD_PROBS[TEN]
+        value = natural * self.blackjack_payout
+        for dealer_card in DEALER_CARDS:
+            blackjack = _blackjack_index(dealer_card)
+            dealer_blackjack = CARD_PROBS[blackjack] if blackjack is not None else 0.0
+            playing = 0.0
+            for i, p in enumerate(CARD_PROBS):
+                for j, q in enumerate(CARD_PROBS):
+                    if {i, j} == {ACE, TEN}:
+                        continue
+                    hard = _hard_value(VALUES[i]) + _hard_value(VALUES[j])
+                    playing += p * q * self._value(hard, ACE in (i, j), dealer_card, True, table, memo)
+            p_dealer_card = CARD_PROBS[VALUES.index(dealer_card)]
+            value += p_dealer_card * (dealer_blackjack * -(1 - natural) + (1 - dealer_blackjack) * playing)
+        return float(value)
+
+    def _value(self, hard, ace, dealer_card, can_double, table, memo):
+        """Value of a state when playing the policy table, or optimally if table is None"""
+        total = _total(hard, ace)
+        if total > 21:
+            return -1.0
+        key = (hard, ace, dealer_card, can_double)
+        if key in memo:
+            return memo[key]
+        if table is None:
+            value = max(self._stay(total, dealer_card), self._hit(hard, ace, dealer_card, None, memo))
+            if can_double:
+                value = max(value, self._double(hard, ace, dealer_card))
+        else:
+            soft = ace and hard + 10 <= 21
+            action = Action(int(table[total, dealer_card, int(soft), int(can_double)]))
+            if action == Action.STAY:
+                value = self._stay(total, dealer_card)
+            elif action == Action.DOUBLE and can_double:
+                value = self._double(hard, ace, dealer_card)
+            else:
+                value = self._hit(hard, ace, dealer_card, table, memo)
+        memo[key] = value
+        return value
+
+    def _stay(self, player_sum, dealer_card):
+        if player_sum > 21:
+            return -1.0
+        return self.stay_values[player_sum, dealer_card]
+
+    def _hit(self, hard, ace, dealer_card, table, memo):
+        """Value of hitting and then playing on"""
+        value = 0.0
+        for i, p in enumerate(CARD_PROBS):
+            value += p * self._value(hard + _hard_value(VALUES[i]), ace or i == ACE, dealer_card, False, table, memo)
+        return value
+
+    def _double(self, hard, ace, dealer_card):
+        """Value of doubling the bet and taking exactly one card"""
+        value = 0.0
+        for i, p in enumerate(CARD_PROBS):
+            value += p * self._stay(_total(hard + _hard_value(VALUES[i]), ace or i == ACE), dealer_card)
+        return 2 * value
+
+    def _stay_outcome(self, player_sum, outcomes):
+        win = outcomes[BUST] + sum(p for total, p in zip(DEALER_TOTALS, outcomes) if player_sum > total)
+        lose = sum(p for total, p in zip(DEALER_TOTALS, outcomes) if player_sum < total)
+        return float(win - lose)
+
+    def _dealer_play(self, hard, ace):
+        """Distribution of the dealer's final total when drawing until reaching 17"""
+        total = _total(hard, ace)
+        soft = ace and hard + 10 <= 21
+        if total > 17 or total == 17 and not (soft and self.hit_soft_17):
+            outcomes = np.zeros(len(DEALER_TOTALS) + 1)
+            outcomes[BUST if total > 21 else total - 17] = 1.0
+            return outcomes
+        key = (hard, ace)
+        if key in self._dealer_memo:
+            return self._dealer_memo[key]
+        outcomes = np.zeros(len(DEALER_TOTALS) + 1)
+        for i, p in enumerate(CARD_PROBS):
+            outcomes += p * self._dealer_play(hard + _hard_value(VALUES[i]), ace or i == ACE)
+        self._dealer_memo[key] = outcomes
+        return outcomes
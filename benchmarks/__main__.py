@@ -0,0 +1,47 @@
+"""
+Runs the benchmark suite and compares it against the stored baseline.
+
+    python -m benchmarks [--filter env.] [--scale 0.1] [--output results.json] [--update-baseline]
+"""
+
+import argparse
+import os
+import sys
+
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+from benchmarks import harness
+from benchmarks import bench_env, bench_agents, bench_startup, bench_analysis # Registers the benchmarks
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Blackjack throughput and memory benchmarks")
+    parser.add_argument("--filter", nargs="*", help="Only run benchmarks whose name starts with one of these")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplier on the work done by each benchmark")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per benchmark, the best is kept")
+    parser.add_argument("--output", help="Where to write the JSON results")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=harness.DEFAULT_THRESHOLD, help="Allowed relative slowdown or memory growth")
+    parser.add_argument("--update-baseline", action="store_true", help="Overwrite the baseline with these results")
+    args = parser.parse_args(argv)
+
+    results = harness.run_all(args.filter, args.scale, args.repeat)
+    if args.output:
+        harness.save(results, args.output)
+    if args.update_baseline:
+        harness.save(results, args.baseline)
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}, run with --update-baseline to create one")
+        return 0
+
+    regressions = harness.compare(results, harness.load(args.baseline), args.threshold)
+    for name, metric, previous, current in regressions:
+        print(f"REGRESSION {name} {metric}: {previous:,.2f} -> {current:,.2f}")
+    if not regressions:
+        print(f"No regressions beyond {args.threshold:.0%} of the baseline")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
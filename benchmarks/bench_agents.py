@@ -0,0 +1,84 @@
+"""End-to-end agent throughput and the cost of the agents' reporting"""
+
+import os
+
+import gym
+import numpy as np
+
+import gym_env
+from benchmarks.harness import benchmark, SkipBenchmark
+from agents.agent_random import RandomAgent
+from agents.agent_never_bust import NeverBustAgent
+from agents.agent_basic_strategy import BasicStrategyAgent
+from agents.agent_counting import CountingAgent
+
+AGENTS = {
+    "random": RandomAgent,
+    "never_bust": NeverBustAgent,
+    "basic_strategy": BasicStrategyAgent,
+}
+
+def make_env():
+    return gym.make("blackjack_env-v0", verbose=False)
+
+def make_shoe_env():
+    """A six deck shoe dealt to 75%, where counting pays"""
+    return gym.make("blackjack_env-v0", verbose=False, num_decks=6, penetration=0.75)
+
+# The saved model in the repo root. Benchmarks run in a scratch directory, so it is found by absolute path
+PPO_MODEL_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ppo_blackjack")
+
+def ppo_agent_cls():
+    try:
+        from agents.agent_ppo import PPOAgent
+    except ImportError as e:
+        raise SkipBenchmark(f"PPOAgent needs stable_baselines3 ({e})")
+    if not os.path.exists(f"{PPO_MODEL_PATH}.zip"):
+        raise SkipBenchmark(f"PPOAgent needs a saved model at {PPO_MODEL_PATH}.zip")
+    return lambda name, env: PPOAgent(name, env, PPO_MODEL_PATH)
+
+def _register_run(name, get_agent_cls, size):
+    @benchmark(f"agent.run.{name}", size=size)
+    def run(hands):
+        get_agent_cls()(name, make_env()).run(episodes=hands)
+
+    @benchmark(f"agent.run_compiled.{name}", size=size)
+    def run_compiled(hands):
+        agent = get_agent_cls()(name, make_env())
+        agent.compile_policy()
+        agent.run(episodes=hands)
+
+for _name, _cls in AGENTS.items():
+    _register_run(_name, lambda cls=_cls: cls, 50000)
+_register_run("ppo_agent", ppo_agent_cls, 2000)
+
+@benchmark("agent.run_shoe.basic_strategy_compiled", size=50000)
+def run_shoe_basic_strategy(hands):
+    agent = BasicStrategyAgent("basic_strategy", make_shoe_env())
+    agent.compile_policy()
+    agent.run(episodes=hands)
+
+@benchmark("agent.run_shoe.counting", size=50000)
+def run_shoe_counting(hands):
+    CountingAgent("counting", make_shoe_env()).run(episodes=hands)
+
+@benchmark("agent.run_parallel.basic_strategy", size=200000, memory=False)
+def run_parallel(hands):
+    BasicStrategyAgent("basic_strategy", make_env()).run_parallel(episodes=hands, seed=0)
+
+@benchmark("agent.visualize_policy", unit="calls", size=3, memory=False)
+def visualize_policy(calls):
+    import matplotlib.pyplot as plt
+    agent = BasicStrategyAgent("basic_strategy", make_env())
+    for _ in range(calls):
+        agent.visualize_policy()
+        plt.close("all")
+
+@benchmark("agent.get_metrics", unit="calls", size=3, memory=False)
+def get_metrics(calls, hands=1000000):
+    import matplotlib.pyplot as plt
+    agent = BasicStrategyAgent("basic_strategy", make_env())
+    agent.rewards = np.random.default_rng(0).choice([-1.0, 0.0, 1.0, 1.5], size=hands).tolist()
+    for _ in range(calls):
+        agent.get_metrics()
+        plt.close("all")
@@ -0,0 +1,29 @@
+"""Per-decision cost of exact expected values, queried from a shoe the way a hot loop would"""
+
+from benchmarks.harness import benchmark
+from analysis.exact_ev import ExactEV
+from gym_env import Blackjack
+
+def play_by_exact_ev(decisions, num_decks, count_observation=False):
+    """Takes the best action by exact EV for a number of decisions, with one ExactEV serving a persistent shoe"""
+    env = Blackjack(verbose=False, num_decks=num_decks, penetration=0.75, count_observation=count_observation)
+    ev = ExactEV()
+    env.reset(seed=0)
+    done = 0
+    while done < decisions:
+        if env.terminated:
+            env.reset()
+            continue
+        values = ev.evaluate(env)
+        legal_moves = env.legal_moves
+        env.step(max((act for act in values if act in legal_moves), key=values.get).value)
+        done += 1
+
+@benchmark("exact_ev.decision.one_deck", unit="decisions", size=200, memory=False)
+def decision_one_deck(decisions):
+    play_by_exact_ev(decisions, 1)
+
+@benchmark("exact_ev.decision.six_decks", unit="decisions", size=60, memory=False)
+def decision_six_decks(decisions):
+    """A counting shoe, so the env appends the count to the observations ExactEV reads"""
+    play_by_exact_ev(decisions, 6, count_observation=True)
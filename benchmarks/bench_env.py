@@ -0,0 +1,42 @@
+"""Raw environment throughput"""
+
+import numpy as np
+
+from benchmarks.harness import benchmark
+from gym_env import Blackjack, BatchBlackjack, BlackjackTable
+from gym_env.enums import Action
+
+@benchmark("env.reset_step", size=100000)
+def reset_step(hands):
+    """Blackjack.reset and step, hitting below 17"""
+    env = Blackjack(verbose=False)
+    env.reset(seed=0)
+    for hand in range(hands):
+        if hand:
+            env.reset()
+        while not env.terminated:
+            env.step(Action.HIT.value if env.observation[0] < 17 else Action.STAY.value)
+
+@benchmark("env.batch", size=1000000)
+def batch(hands, num_envs=4096):
+    """BatchBlackjack playing the same policy on many tables"""
+    env = BatchBlackjack(min(num_envs, hands))
+    env.reset(seed=0)
+    played = 0
+    while played < hands:
+        if played:
+            env.reset()
+        while not env.terminated.all():
+            env.step(np.where(env.observation[:, 0] < 17, Action.HIT.value, Action.STAY.value))
+        played += env.num_envs
+
+@benchmark("env.table", size=100000)
+def table(hands, num_seats=5):
+    """BlackjackTable rounds, hitting below 17. A unit is one seat's hand."""
+    env = BlackjackTable(num_seats)
+    env.reset(seed=0)
+    for rnd in range(-(-hands // num_seats)):
+        if rnd:
+            env.reset()
+        while not env.terminated:
+            env.step(Action.HIT.value if env.observation[env.seat, 0] < 17 else Action.STAY.value)
@@ -0,0 +1,58 @@
+"""Cold start of a fresh process that only simulates: imports, one env and one agent, no plotting, rendering or RL"""
+
+import json
+import os
+import subprocess
+import sys
+
+from benchmarks.harness import benchmark, SkipBenchmark
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules the simulation-only path must not load
+HEAVY_MODULES = ("pyglet", "matplotlib", "seaborn", "pandas", "torch", "stable_baselines3")
+
+SIMULATION = f"""
+import json, resource, sys, time
+
+def peak_rss_bytes():
+    # ru_maxrss survives fork+exec on Linux, so it would report the benchmark runner's peak. VmHWM resets on exec
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024 # ru_maxrss is in bytes on macOS, KB elsewhere
+
+start = time.perf_counter()
+from gym_env import Blackjack
+from agents.agent_basic_strategy import BasicStrategyAgent
+imported = time.perf_counter()
+BasicStrategyAgent("basic_strategy", Blackjack(verbose=False)).run(episodes=100, streaming=True)
+print(json.dumps({{
+    "import_seconds": imported - start,
+    "peak_rss_bytes": peak_rss_bytes(),
+    "heavy_modules": [name for name in {HEAVY_MODULES!r} if name in sys.modules],
+}}))
+"""
+
+@benchmark("startup.simulation", unit="starts", size=5, memory=False)
+def simulation(starts):
+    """Fresh interpreters importing Blackjack and BasicStrategyAgent and playing 100 hands"""
+    if sys.platform == "win32":
+        raise SkipBenchmark("max RSS is read with the resource module")
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])))
+    runs = []
+    for _ in range(starts):
+        out = subprocess.run([sys.executable, "-c", SIMULATION], env=env, check=True, capture_output=True, text=True)
+        runs.append(json.loads(out.stdout.splitlines()[-1]))
+    heavy = sorted({name for run in runs for name in run["heavy_modules"]})
+    if heavy:
+        raise RuntimeError(f"The simulation-only path imported {', '.join(heavy)}")
+    return {
+        "import_seconds": min(run["import_seconds"] for run in runs),
+        "max_rss_mb": max(run["peak_rss_bytes"] for run in runs) / 2 ** 20,
+    }
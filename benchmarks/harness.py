@@ -0,0 +1,161 @@
+"""Registry, runner and baseline comparison for the benchmark suite"""
+
+import json
+import os
+import platform
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import numpy as np
+
+BENCHMARKS = {}
+
+# Metrics besides the rate where a larger value is a regression
+LOWER_IS_BETTER = ("peak_mb_per_million", "max_rss_mb")
+
+# Relative slowdown or memory growth tolerated before a change counts as a regression
+DEFAULT_THRESHOLD = 0.2
+
+class Benchmark:
+    """
+    A named workload. func(n) processes n units (hands, calls, ...) and the harness times it.
+    func may return a dict of extra metrics, e.g. max_rss_mb, which are reported with the fastest run.
+    Benchmarks that need an optional dependency raise SkipBenchmark when it is missing.
+    """
+
+    def __init__(self, name, func, unit, size, memory):
+        self.name = name
+        self.func = func
+        self.unit = unit
+        self.size = size
+        self.memory = memory
+
+class SkipBenchmark(Exception):
+    """Raised by a benchmark that cannot run in this environment"""
+
+def benchmark(name, unit="hands", size=100000, memory=True):
+    """
+    Registers a benchmark
+
+    Args:
+        name (str): Unique name, dotted by area, e.g. "env.step"
+        unit (str): What one unit of work is. Rates are reported in units per second
+        size (int): Units per timed run at scale 1
+        memory (bool): Whether to also measure peak memory per million units
+    """
+    def register(func):
+        if name in BENCHMARKS:
+            raise ValueError(f"Benchmark {name} is already registered")
+        BENCHMARKS[name] = Benchmark(name, func, unit, size, memory)
+        return func
+    return register
+
+@contextmanager
+def scratch_dir():
+    """Runs a benchmark inside a temporary working directory, so files it saves do not touch the repo"""
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        for subdir in ("results", "log", os.path.join("agents", "agent_policies")):
+            os.makedirs(os.path.join(tmp, subdir))
+        os.chdir(tmp)
+        try:
+            yield tmp
+        finally:
+            os.chdir(cwd)
+
+def run_benchmark(bench, scale=1.0, repeat=3, memory_size=20000):
+    """
+    Times a benchmark and, if enabled, measures its peak traced memory
+
+    Returns:
+        dict with the unit, the number of units, the best time in seconds, the rate in units per second
+        and peak_mb_per_million
+    """
+    n = max(1, int(bench.size * scale))
+    with scratch_dir():
+        times = []
+        extras = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            extras.append(bench.func(n))
+            times.append(time.perf_counter() - start)
+        fastest = int(np.argmin(times))
+        result = {"unit": bench.unit, "n": n, "seconds": times[fastest], "rate": n / times[fastest]}
+        if isinstance(extras[fastest], dict):
+            result.update(extras[fastest])
+
+        if bench.memory:
+            n_mem = max(1, min(n, memory_size))
+            tracemalloc.start()
+            try:
+                bench.func(n_mem)
+                _, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+            result["peak_mb_per_million"] = peak / n_mem * 1e6 / 2 ** 20
+    return result
+
+def run_all(names=None, scale=1.0, repeat=3, log=print):
+    """Runs every registered benchmark, or those whose name starts with one of names"""
+    results = {}
+    for name, bench in sorted(BENCHMARKS.items()):
+        if names and not any(name.startswith(prefix) for prefix in names):
+            continue
+        try:
+            results[name] = run_benchmark(bench, scale, repeat)
+        except SkipBenchmark as e:
+            results[name] = {"skipped": str(e)}
+        log(_format_result(name, results[name]))
+    return {"meta": _meta(scale), "results": results}
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Compares results against a baseline. A rate that drops, or a memory metric (LOWER_IS_BETTER) that grows,
+    by more than threshold (a fraction) is a regression.
+
+    Returns:
+        list of (name, metric, baseline value, current value) for every regression
+    """
+    regressions = []
+    for name, current in results["results"].items():
+        previous = baseline["results"].get(name)
+        if previous is None or "skipped" in current or "skipped" in previous:
+            continue
+        if current["rate"] < previous["rate"] * (1 - threshold):
+            regressions.append((name, "rate", previous["rate"], current["rate"]))
+        for metric in LOWER_IS_BETTER:
+            if metric in current and metric in previous and current[metric] > previous[metric] * (1 + threshold):
+                regressions.append((name, metric, previous[metric], current[metric]))
+    return regressions
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+def save(results, path):
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+def _meta(scale):
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpus": os.cpu_count(),
+        "scale": scale,
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+def _format_result(name, result):
+    if "skipped" in result:
+        return f"{name:<40} skipped: {result['skipped']}"
+    line = f"{name:<40} {result['rate']:>14,.1f} {result['unit']}/s"
+    if "peak_mb_per_million" in result:
+        line += f" {result['peak_mb_per_million']:>12,.2f} MB per million {result['unit']}"
+    if "max_rss_mb" in result:
+        line += f" {result['max_rss_mb']:>10,.1f} MB max RSS"
+    return line
@@ -1,5 +1,8 @@
 from gym.envs.registration import register
 from gym_env.env import Blackjack
+from gym_env.rules import Rules
+from gym_env.batch_env import BatchBlackjack
+from gym_env.table import BlackjackTable
 
 register(
     id="blackjack_env-v0", 
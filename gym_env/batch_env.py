@@ -0,0 +1,197 @@
+"""Vectorized Blackjack engine that plays many independent tables in lockstep"""
+
+import numpy as np
+
+from gym.utils import seeding
+from gym_env.enums import Action, BASIC_ACTIONS
+from gym_env.shoe import CARD_VALUES
+
+# Card values of a single deck, ace counted as 11. Suits are irrelevant to the batched engine.
+DECK_VALUES = np.array(CARD_VALUES, dtype=np.int8)
+
+class BatchBlackjack:
+    """
+    N independent Blackjack tables held as integer arrays.
+
+    Every table follows the rules of gym_env.env.Blackjack: a fresh shoe per hand, dealer stands on 17,
+    blackjack pays 3:2, double only on the first two cards and illegal actions are ignored.
+    Unlike Blackjack, naturals are settled directly in reset() instead of on the first step.
+    """
+
+    def __init__(self, num_envs, num_decks=1):
+        """
+        Args:
+            num_envs (int): The number of tables to play in lockstep
+            num_decks (int): The number of decks in each table's shoe
+        """
+        self.num_envs = num_envs
+        self.num_decks = num_decks
+        self.max_cards = 22 # At most 21 aces counted as 1 plus the card that busts the hand
+        self.np_random = None
+        self.shoe = None
+        self.shoe_pos = None
+        self.player_hand = None
+        self.dealer_hand = None
+        self.player_cards = None
+        self.dealer_cards = None
+        self.player_sum = None
+        self.dealer_sum = None
+        self.player_soft = None
+        self.dealer_soft = None
+        self._player_hard = None
+        self._dealer_hard = None
+        self._player_ace = None
+        self._dealer_ace = None
+        self.bet = None
+        self.reward = None
+        self.terminated = None
+        self.observation = np.zeros((num_envs, 3), dtype=np.float32)
+        self._rows = np.arange(num_envs)
+        self._deck = np.tile(DECK_VALUES, num_decks)
+
+    def reset(self, seed=None):
+        """
+        Deals a new hand on every table. Returns the (N, 3) observation and an info dict.
+        The info holds "terminated", the tables settled by a natural, "reward", their payouts (0 on every other
+        table), and "legal_moves". Natural payouts are never reported by step, so callers that add up rewards
+        must include info["reward"].
+        """
+        if seed is not None or self.np_random is None:
+            self.np_random, _ = seeding.np_random(seed)
+
+        n = self.num_envs
+        self.shoe = self.np_random.permuted(np.broadcast_to(self._deck, (n, self._deck.size)), axis=1)
+        self.shoe_pos = np.zeros(n, dtype=np.int64)
+        self.player_hand = np.zeros((n, self.max_cards), dtype=np.int8)
+        self.dealer_hand = np.zeros((n, self.max_cards), dtype=np.int8)
+        self.player_cards = np.zeros(n, dtype=np.int64)
+        self.dealer_cards = np.zeros(n, dtype=np.int64)
+        self.player_sum = np.zeros(n, dtype=np.int64)
+        self.dealer_sum = np.zeros(n, dtype=np.int64)
+        self.player_soft = np.zeros(n, dtype=bool)
+        self.dealer_soft = np.zeros(n, dtype=bool)
+        self._player_hard = np.zeros(n, dtype=np.int64)
+        self._dealer_hard = np.zeros(n, dtype=np.int64)
+        self._player_ace = np.zeros(n, dtype=bool)
+        self._dealer_ace = np.zeros(n, dtype=bool)
+        self.bet = np.ones(n, dtype=np.float64)
+        self.reward = np.zeros(n, dtype=np.float64)
+        self.terminated = np.zeros(n, dtype=bool)
+
+        everyone = np.ones(n, dtype=bool)
+        self._deal_player(everyone)
+        self._deal_player(everyone)
+        self._deal_dealer(everyone)
+        self._deal_dealer(everyone)
+
+        naturals = self._naturals()
+        self._game_over(naturals)
+        self._get_observation()
+
+        info = {"terminated": naturals, "reward": np.where(naturals, self.reward, 0.0), "legal_moves": self.legal_moves()}
+        return self.observation, info
+
+    def step(self, actions):
+        """
+        Applies one action per table. Actions on finished tables and illegal actions are ignored.
+
+        Args:
+            actions (np.ndarray): Array of N Action values
+
+        Returns:
+            observation, reward, terminated, truncated, info. Rewards are only reported on the step a table finishes.
+        """
+        actions = np.asarray(actions)
+        active = ~self.terminated
+        stay = active & (actions == Action.STAY.value)
+        hit = active & (actions == Action.HIT.value)
+        double = active & (actions == Action.DOUBLE.value) & (self.player_cards == 2)
+
+        self._deal_player(hit | double)
+        self.bet[double] *= 2
+        self._process_dealer(stay | double)
+
+        finished = stay | double | (hit & (self.player_sum > 21))
+        self._game_over(finished)
+        self._get_observation()
+
+        reward = np.where(finished, self.reward, 0.0)
+        truncated = np.zeros(self.num_envs, dtype=bool)
+        info = {"legal_moves": self.legal_moves()}
+
+        return self.observation, reward, self.terminated.copy(), truncated, info
+
+    def legal_moves(self):
+        """Returns an (N, 3) boolean mask of the legal actions on each table, indexed by Action value"""
+        mask = np.zeros((self.num_envs, len(BASIC_ACTIONS)), dtype=bool) # Only the default rules are played
+        active = ~self.terminated
+        mask[:, Action.STAY.value] = active
+        mask[:, Action.HIT.value] = active
+        mask[:, Action.DOUBLE.value] = active & (self.player_cards == 2)
+        return mask
+
+    def _naturals(self):
+        """Tables where the player or dealer was dealt blackjack"""
+        return ((self.player_sum == 21) & (self.player_cards == 2)) | ((self.dealer_sum == 21) & (self.dealer_cards == 2))
+
+    def _game_over(self, mask):
+        """Settles the tables in mask. Same payout order as Blackjack._game_over."""
+        player_sum = self.player_sum[mask]
+        dealer_sum = self.dealer_sum[mask]
+        bet = self.bet[mask]
+        self.reward[mask] = np.select(
+            [
+                (player_sum == 21) & (self.player_cards[mask] == 2), # Blackjack
+                player_sum > 21,                                     # Player busted
+                dealer_sum > 21,                                     # Dealer busted
+                player_sum > dealer_sum,                             # Player won
+                player_sum < dealer_sum,                             # Dealer won
+            ],
+            [1.5 * bet, -bet, bet, bet, -bet],
+            default=0.0,                                             # Shove
+        )
+        self.terminated |= mask
+
+    def _process_dealer(self, mask):
+        """Dealer draws to 17 on every table in mask"""
+        drawing = mask & (self.dealer_sum < 17)
+        while drawing.any():
+            self._deal_dealer(drawing)
+            drawing &= self.dealer_sum < 17
+
+    def _draw_cards(self, mask):
+        """Draws the next card from the shoe of every table in mask"""
+        rows = self._rows[mask]
+        cards = self.shoe[rows, self.shoe_pos[rows]]
+        self.shoe_pos[rows] += 1
+        return rows, cards
+
+    def _deal_player(self, mask):
+        rows, cards = self._draw_cards(mask)
+        self.player_hand[rows, self.player_cards[rows]] = cards
+        self.player_cards[rows] += 1
+        self._player_hard[rows] += np.where(cards == 11, 1, cards)
+        self._player_ace[rows] |= cards == 11
+        self.player_sum[rows], self.player_soft[rows] = _hand_value(self._player_hard[rows], self._player_ace[rows])
+
+    def _deal_dealer(self, mask):
+        rows, cards = self._draw_cards(mask)
+        self.dealer_hand[rows, self.dealer_cards[rows]] = cards
+        self.dealer_cards[rows] += 1
+        self._dealer_hard[rows] += np.where(cards == 11, 1, cards)
+        self._dealer_ace[rows] |= cards == 11
+        self.dealer_sum[rows], self.dealer_soft[rows] = _hand_value(self._dealer_hard[rows], self._dealer_ace[rows])
+
+    def _get_observation(self):
+        """Writes player sum, dealer show card and usable ace into the observation buffer"""
+        self.observation[:, 0] = self.player_sum
+        self.observation[:, 1] = self.dealer_hand[:, 0]
+        self.observation[:, 2] = self.player_soft
+
+def _hand_value(hard, ace):
+    """
+    Value of hands given their hard total (aces counted as 1) and whether they hold an ace.
+    Equivalent to Blackjack._get_hand_value: returns the total and whether an ace still counts as 11.
+    """
+    soft = ace & (hard + 10 <= 21)
+    return hard + 10 * soft, soft
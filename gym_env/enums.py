@@ -4,4 +4,20 @@ class Action(Enum):
     """Actions"""
     STAY = 0
     HIT = 1
-    DOUBLE = 2
\ No newline at end of file
+    DOUBLE = 2
+    SURRENDER = 3 # Only legal under rules that allow it, see gym_env.rules.Rules
+    SPLIT = 4
+
+# Every action of the default rules, which are all most agents play
+BASIC_ACTIONS = (Action.STAY, Action.HIT, Action.DOUBLE)
+
+def action_mask(actions):
+    """Bitmask of the given actions: bit a.value is set for every action a"""
+    mask = 0
+    for action in actions:
+        mask |= 1 << Action(action).value
+    return mask
+
+def mask_actions(mask):
+    """Actions whose bit is set in the mask"""
+    return [action for action in Action if mask >> action.value & 1]
@@ -1,73 +1,164 @@
+import atexit
 import logging
+import logging.handlers
+import queue
+import time
 import numpy as np
 
 from gym import Env
 from gym.spaces import Discrete, Box
-from gym_env.enums import Action
-from gym_env.rendering import BlackjackWindow
+from gym_env.enums import Action, BASIC_ACTIONS, action_mask, mask_actions
+from gym_env.rules import DEFAULT_RULES, BUST, BLACKJACK, SURRENDERED, NO_PAIR, PAIR, ACES, STAY_HIT_MASK, EVERY_ACTION_MASK, SPLIT_ACES_MASK
+from gym_env.shoe import Shoe, CARD_VALUES, CARD_NAMES, HI_LO, card_str, hand_str
+from gym_env.profiling import PhaseProfiler, ENV_PHASES
 
 log = logging.getLogger(__name__)
-logging.basicConfig(filename='log/env.log', level=logging.INFO)
+_log_listener = None
+
+NO_ACTIONS_MASK = 0
+ALL_ACTIONS_MASK = action_mask(BASIC_ACTIONS) # Every action on two cards under the default rules
+# Shared legal move lists, so updating legal_moves allocates nothing. Do not modify them.
+LEGAL_MOVES = {mask: mask_actions(mask) for mask in range(1 << len(Action))}
+
+def _enable_file_logging(filename='log/env.log'):
+    """Sends the env's log to a file through a background thread, so logging never blocks a step"""
+    global _log_listener
+    if _log_listener is not None:
+        return
+    handler = logging.FileHandler(filename)
+    handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+    log_queue = queue.SimpleQueue()
+    _log_listener = logging.handlers.QueueListener(log_queue, handler)
+    _log_listener.start()
+    log.addHandler(logging.handlers.QueueHandler(log_queue))
+    log.setLevel(logging.INFO)
+    atexit.register(_log_listener.stop)
 
 class Blackjack(Env):
     """Blackjack Environment"""
-    metadata = {"render_modes": ["human"], "render_fps": 30}
+    metadata = {"render_modes": ["human", "rgb_array"], "render_fps": 30}
     
-    def __init__(self, num_decks=1, render_mode=None, verbose=True):
+    def __init__(self, num_decks=1, render_mode=None, verbose=True, penetration=None, cut_card=None, recorder=None,
+                 count_observation=False, rules=None):
         """
         Only need to initialize the game once in the beginning
 
         Args:
             num_decks (int): The number of decks to play with
             bet (float): how much to bet
-            render_mode (bool, optional): How to render the game. If None, do not render 
+            render_mode (str, optional): "human" for a window, "rgb_array" for offscreen frames. If None, do not render 
+            penetration (float, optional): Fraction of the shoe dealt before reshuffling. If None, every hand uses a fresh shoe
+            cut_card (int, optional): Number of cards dealt before reshuffling. Overrides penetration
+            recorder (HandHistoryRecorder, optional): Records every finished hand. Its max_hands must cover the rules'
+            count_observation (bool): Append the Hi-Lo running count and true count to the observation, for agents
+                that read them. They are available as running_count and true_count either way
+            rules (Rules, optional): House rules. Defaults to Rules(), the rules the env has always played
         """
         self.num_decks = num_decks
+        self.rules = rules or DEFAULT_RULES
         self.bet = None
-        self.observation = None
-        self.deck = None
-        self.player_hand = None
+        self.base_bet = None
+        self.count_observation = count_observation
+        self.observation = np.zeros(5 if count_observation else 3, dtype=np.float32) # Written in place on every reset and step
+        self.shoe = Shoe(num_decks, penetration, cut_card)
+        self.reshuffled = False
+        self.player_hand = None # The hand being played. Other hands of a split round are in hands and pending
+        self.player_cards = None # Every card dealt to the player this round, in deal order
+        self.hands = None # (hand code, bet) of every finished hand, see gym_env.rules
+        self.pending = None # First cards of the split hands still to be played
+        self.num_hands = None
+        self.dealer_plays = None
+        self._pair = None
+        self._hand_mask = None
         self.dealer_hand = None
         self.legal_moves = None
+        self.action_mask = NO_ACTIONS_MASK
+        self.player_sum = None
+        self.player_soft = None
+        self.dealer_sum = None
+        self.dealer_soft = None
+        self._player_hard = None
+        self._player_ace = None
+        self._dealer_hard = None
+        self._dealer_ace = None
         self.reward = None
         self.terminated = None
         self.can_move = None
+        self._natural = None # Whether the hand was dealt a natural, which the first step settles
         self.screen = None
+        self.rendered_state = None
+        self.last_frame_time = 0.0
+        self.frame = None
+        self.profiler = None
         self.illegal_move_reward = -1
         
-        if not verbose:
-            log.disabled = True
+        self.verbose = verbose
+        if recorder is not None and recorder.max_hands < self.rules.max_hands:
+            raise ValueError(
+                f"The recorder holds rounds of at most {recorder.max_hands} hands, but the rules allow "
+                f"{self.rules.max_hands}. Create it with HandHistoryRecorder(path, max_hands={self.rules.max_hands})"
+            )
+        self.recorder = recorder
+        self.hand_actions = None
+        self.recorded = None
+        if verbose:
+            _enable_file_logging()
         
         # Gym API
         self.render_mode = render_mode
-        self.action_space = Discrete(len(Action))
+        self.action_space = Discrete(max(action.value for action in self.rules.actions) + 1)
         self.observation_space = Box(
             low=np.array([0, 0, 0]),
             high=np.array([31, 10, 1]),
             dtype=np.float32
         ) # Player's score, dealer's card, usable ace
+        if count_observation:
+            max_count = 20 * num_decks # Every ten and ace of the shoe
+            self.observation_space = Box(
+                low=np.array([0, 0, 0, -max_count, -max_count * len(CARD_NAMES)]),
+                high=np.array([31, 10, 1, max_count, max_count * len(CARD_NAMES)]),
+                dtype=np.float32
+            ) # Player's score, dealer's card, usable ace, running count, true count
     
     def reset(self, seed=None, options=None):
-        """Resets the game. Creates a new environment and returns the agent's observation"""
-        log.info("")
-        log.info("==================")
-        log.info("Starting new game.")
-        log.info("==================")
+        """
+        Resets the game. Creates a new environment and returns the agent's observation
+
+        Args:
+            seed (int, optional): Reseeds the env and reshuffles the shoe
+            options (dict, optional): "bet" sets the hand's initial bet, 1 by default
+        """
+        if self.verbose:
+            log.info("")
+            log.info("==================")
+            log.info("Starting new game.")
+            log.info("==================")
         
         super().reset(seed=seed)
         
         self.reward = 0
-        self.bet = 1
-        self.observation = None
+        self.bet = self.base_bet = options.get("bet", 1) if options else 1
+        self.hands = []
+        self.pending = []
+        self.num_hands = 1
+        self.dealer_plays = False
+        self._hand_mask = EVERY_ACTION_MASK
         self.terminated = None
         self.can_move = True
-        self._create_deck()
+        if self.recorder is not None:
+            self.hand_actions = []
+            self.recorded = False
+        self.reshuffled = False
+        if seed is not None or self.shoe.needs_shuffle():
+            self._create_shoe()
         self._deal_cards()
+        self._natural = self.player_sum == 21 or self.dealer_sum == 21 # Both hands have two cards
         self._get_observation()
         
-        log.info(f"Player hand: {self.player_hand}, Dealer Show Card: {self.dealer_hand[0]}, Dealer Hand: {self.dealer_hand}")
+        if self.verbose:
+            log.info(f"Player hand: {hand_str(self.player_hand)}, Dealer Show Card: {card_str(self.dealer_hand[0])}, Dealer Hand: {hand_str(self.dealer_hand)}")
         
-        info = {}
+        info = {"reshuffled": self.reshuffled, "action_mask": self.action_mask}
         
         return self.observation, info
     
@@ -77,191 +168,357 @@ class Blackjack(Env):
 
         Args:
             action: Needs to be an Action type
+            
+        The returned observation is a buffer that the next reset or step overwrites. Copy it to keep it.
         """
-        self._get_observation()
-        if not self._check_game_over():
-            if Action(action) not in self.legal_moves:
+        self.reshuffled = False
+        # A natural ends the hand on its first step, whatever the action. Any other hand was checked by the step before
+        terminated = self.terminated or self._natural and self._check_game_over()
+        if not terminated:
+            action = Action(action)
+            if not self.action_mask >> action.value & 1:
                 self._illegal_move(action)
             else:
-                self._process_action(Action(action))
+                self._process_action(action)
                 self._get_observation()
+            terminated = self._check_game_over()
                 
-        log.info(f"Player: {Action(action)} - Player hand: {self.player_hand}")
-        log.info(f"Dealer Show Card: {self.dealer_hand[0]}")
-        log.info(f"Dealer Hand: {self.dealer_hand}")        
+        if self.verbose:
+            log.info(f"Player: {Action(action)} - Player hand: {hand_str(self.player_hand)}")
+            log.info(f"Dealer Show Card: {card_str(self.dealer_hand[0])}")
+            log.info(f"Dealer Hand: {hand_str(self.dealer_hand)}")        
         
-        terminated = self._check_game_over()
+        if self.recorder is not None:
+            self._record(action, terminated)
         truncated = False
-        info = {}
+        info = {"reshuffled": self.reshuffled, "action_mask": self.action_mask}
         
         return self.observation, self.reward, terminated, truncated, info
     
+    def next_hand_true_count(self):
+        """True count the next hand will be dealt at, for sizing its bet: 0 if the shoe is reshuffled first"""
+        return 0.0 if self.shoe.needs_shuffle() else self.true_count
+    
+    def action_masks(self):
+        """Legal actions as a boolean array indexed by Action value, the interface of sb3-contrib's MaskablePPO"""
+        return np.array([self.action_mask >> value & 1 for value in range(self.action_space.n)], dtype=bool)
+    
+    def enable_profiling(self, profiler=None):
+        """
+        Times each phase of the game (dealing, dealer play, observations, legal moves, ...) with a PhaseProfiler.
+        Costs nothing until enabled. Returns the profiler.
+        """
+        if self.profiler is None:
+            self.profiler = profiler or PhaseProfiler()
+            self.profiler.instrument(self, ENV_PHASES)
+        return self.profiler
+    
+    def disable_profiling(self):
+        """Removes the timers. The profiler keeps the totals collected so far."""
+        if self.profiler is not None:
+            self.profiler.uninstrument(self)
+            self.profiler = None
+    
+    def _record(self, action, terminated):
+        """Keeps the hand's actions and hands the finished hand to the recorder"""
+        if self.recorded:
+            return
+        self.hand_actions.append(int(getattr(action, "value", action)))
+        if terminated:
+            bet = sum(bet for _, bet in self.hands)
+            self.recorder.record(self.player_cards, self.dealer_hand, self.hand_actions, bet, self.reward)
+            self.recorded = True
+    
     def _check_game_over(self):
-        """Check if player/dealer has blackjack or busted"""
-        player_sum, _ = self._get_hand_value(self.player_hand)
-        dealer_sum, _ = self._get_hand_value(self.dealer_hand)
-        game_over = False
-        if player_sum == 21 and len(self.player_hand) == 2:
-            game_over = True
-        if dealer_sum == 21 and len(self.dealer_hand) == 2:
+        """Check if player/dealer has blackjack or the player's turn is over"""
+        game_over = not self.can_move
+        if self.player_sum == 21 and len(self.player_hand) == 2 and self.num_hands == 1:
             game_over = True
-        if player_sum > 21 or dealer_sum > 21:
-            game_over = True
-        if not self.can_move:
+        if self.dealer_sum == 21 and len(self.dealer_hand) == 2:
             game_over = True
         if game_over:
             self._game_over()
         return game_over
     
     def _game_over(self):
-        """End of a game. Calculates the reward."""
+        """End of a game. Pays every hand from the rules' payout table."""
         
         self.terminated = True
-        player_sum, _ = self._get_hand_value(self.player_hand)
-        dealer_sum, _ = self._get_hand_value(self.dealer_hand)
-        if player_sum == 21 and len(self.player_hand) == 2: 
-            self.reward = 1.5 * self.bet # Blackjack
-        elif player_sum > 21:
-            self.reward = -self.bet # Player busted
-        elif dealer_sum > 21:
-            self.reward = self.bet # Dealer busted
-        elif player_sum > dealer_sum:
-            self.reward = self.bet # Player won
-        elif player_sum < dealer_sum:
-            self.reward = -self.bet # Dealer won
-        elif player_sum == dealer_sum:
-            self.reward = 0 # Shove
+        if self.count_observation:
+            self._count_observation() # The hole card is shown
+        player_sum = self.player_sum
+        dealer_sum = self.dealer_sum
+        if not self.hands: # A natural ended the round before the player acted
+            natural = player_sum == 21 and len(self.player_hand) == 2
+            self.hands.append((BLACKJACK if natural else player_sum, self.bet))
+        dealer = BLACKJACK if dealer_sum == 21 and len(self.dealer_hand) == 2 else min(dealer_sum, BUST)
+        payout = self.rules.payout
+        if len(self.hands) == 1:
+            hand, bet = self.hands[0]
+            self.reward = bet * payout[hand][dealer]
+        else:
+            self.reward = sum(bet * payout[hand][dealer] for hand, bet in self.hands)
             
-        log.info("Game over.")
-        log.info(f"Player sum: {player_sum}, Dealer sum: {dealer_sum}")
-        log.info(f"Player received reward {self.reward}")
+        if self.verbose:
+            log.info("Game over.")
+            log.info(f"Player sum: {player_sum}, Dealer sum: {dealer_sum}")
+            log.info(f"Player received reward {self.reward}")
             
     def _process_action(self, action):
         """Process the action by the player."""
         if action == Action.STAY:
-            self._process_dealer()
-            self.can_move = False
+            self.dealer_plays = True
+            self._finish_hand(self.player_sum)
         elif action == Action.DOUBLE:
-            self.player_hand.append(self._draw_card())
+            self._deal_player()
             self.bet *= 2
-            self.can_move = False
-            self._process_dealer()
+            self.dealer_plays = True # Even if the double busted
+            self._finish_hand(min(self.player_sum, BUST))
         elif action == Action.HIT:
-            self.player_hand.append(self._draw_card())
+            self._deal_player()
+            if self.player_sum > 21:
+                self._finish_hand(BUST)
+        elif action == Action.SURRENDER:
+            self._finish_hand(SURRENDERED)
+        elif action == Action.SPLIT:
+            card = self.player_hand.pop()
+            self.pending.append(card)
+            self.num_hands += 1
+            self._start_hand(self.player_hand[0])
+    
+    def _finish_hand(self, hand):
+        """Puts the hand aside with its code and moves on to the next split hand, or ends the player's turn"""
+        self.hands.append((hand, self.bet))
+        if self.pending:
+            self._start_hand(self.pending.pop())
+        else:
+            self.can_move = False
+            if self.dealer_plays:
+                self._process_dealer()
+    
+    def _start_hand(self, card):
+        """Makes a hand of a split card and a new card"""
+        self.player_hand = [card]
+        split_ace = CARD_VALUES[card] == 11
+        self._player_ace = split_ace
+        self._player_hard = 1 if split_ace else CARD_VALUES[card]
+        self.bet = self.base_bet
+        self._deal_player()
+        self._set_pair()
+        if split_ace and not self.rules.hit_split_aces:
+            self._hand_mask = SPLIT_ACES_MASK
+            if not self._two_card_mask() >> Action.SPLIT.value & 1: # Cannot split again either, so the hand is done
+                self.dealer_plays = True
+                self._finish_hand(self.player_sum)
+        else:
+            self._hand_mask = EVERY_ACTION_MASK
+    
+    def _set_pair(self):
+        """Whether the hand's two cards are a pair, and of aces"""
+        first, second = CARD_VALUES[self.player_hand[0]], CARD_VALUES[self.player_hand[1]]
+        self._pair = NO_PAIR if first != second else ACES if first == 11 else PAIR
+    
+    def _two_card_mask(self):
+        mask = self.rules.two_card_masks[self.num_hands][self._pair][self.player_sum][self.player_soft]
+        return mask & self._hand_mask
     
     def _process_dealer(self):
-        dealer_sum, _ = self._get_hand_value(self.dealer_hand)
-        while dealer_sum < 17:
-            self.dealer_hand.append(self._draw_card())
-            dealer_sum, _ = self._get_hand_value(self.dealer_hand)
+        stands = self.rules.dealer_stands
+        while not stands[self._dealer_hard][self._dealer_ace]:
+            self._deal_dealer()
     
     def _get_legal_moves(self):
-        """Determines what moves are legal in the current environment"""
+        """Determines what moves are legal in the current environment, as a bitmask and a shared list"""
         if not self.can_move:
-            self.legal_moves = []
-            return
-        self.legal_moves = [Action.STAY, Action.HIT]
-        if len(self.player_hand) == 2:
-            self.legal_moves.append(Action.DOUBLE)
+            self.action_mask = NO_ACTIONS_MASK
+        elif len(self.player_hand) == 2:
+            self.action_mask = self._two_card_mask()
+        else:
+            self.action_mask = STAY_HIT_MASK
+        self.legal_moves = LEGAL_MOVES[self.action_mask]
             
     def _illegal_move(self, action):
-        log.warning(f"{action} is an illegal move, try again. Currently allowed: {self.legal_moves}")
+        if self.verbose:
+            log.warning(f"{action} is an illegal move, try again. Currently allowed: {self.legal_moves}")
         # self.reward = self.illegal_move_reward
             
     def _get_observation(self):
-        """Observe the environment"""
-        if not self.terminated:
-            self._get_legal_moves()
-
-        player_sum, usable_ace = self._get_hand_value(self.player_hand)
-            
-        dealer_card = self.dealer_hand[0]
-        dealer_value = self._get_card_value(dealer_card)
-        
+        """Observe the environment. Writes into the observation buffer instead of allocating a new array."""
         self._get_legal_moves()
-        self.observation = np.array([player_sum, dealer_value, usable_ace], dtype=np.float32)
+        observation = self.observation
+        observation[0] = self.player_sum
+        observation[1] = CARD_VALUES[self.dealer_hand[0]]
+        observation[2] = self.player_soft
+        if self.count_observation:
+            self._count_observation()
+    
+    def _count_observation(self):
+        self.observation[3] = self.running_count
+        self.observation[4] = self.true_count
+    
+    @property
+    def running_count(self):
+        """
+        Hi-Lo count of every card the player has seen since the shoe was shuffled, in O(1) from the shoe's count.
+        The dealer's hole card is left out until the hand is over.
+        """
+        if self.dealer_hand is None:
+            return 0
+        if self.terminated:
+            return self.shoe.running_count
+        return self.shoe.running_count - HI_LO[self.dealer_hand[1]]
+    
+    @property
+    def true_count(self):
+        """Running count per deck the player has not seen"""
+        unseen = len(self.shoe) + (self.dealer_hand is not None and not self.terminated) # The hole card is unseen
+        return self.running_count * len(CARD_NAMES) / max(unseen, 1)
         
     def _get_card_value(self, card):
         """Get the value of the card"""
-        if card[0] in "23456789":
-            return int(card[0])
-        elif card[0] in "TJQK":
-            return 10
-        else:
-            return 11
+        return CARD_VALUES[card]
         
     def _get_hand_value(self, hand):
-        """Get the value of the hand. Also returns how many aces can become soft"""
+        """
+        Get the value of the hand. Also returns how many aces can become soft.
+        The env keeps running totals of its own hands, this is for evaluating arbitrary hands.
+        """
         total = 0
         usable_aces = 0
         for card in hand:
             card_value = self._get_card_value(card)
             if card_value == 11:
-                usable_aces = 1
+                usable_aces += 1
             total += card_value
         while total > 21 and usable_aces > 0:
             total -= 10
             usable_aces -= 1
         return total, usable_aces
                 
-    def _create_deck(self):
-        """Creates the deck of cards. Face cards and suits are preserved for rendering purposes."""
-        values = "23456789TJQKA"
-        suits = "SHCD"
-        self.deck = []
-        _ = [self.deck.append(v + s) for v in values for s in suits for _ in range(self.num_decks)]
+    def _create_shoe(self, in_play=()):
+        """Shuffles every card not in play back into the shoe using the environment's own random generator"""
+        if self.verbose:
+            log.info("Shuffling the shoe.")
+        self.shoe.shuffle(self.np_random, in_play)
+        self.reshuffled = True
             
     def _draw_card(self):
-        """Draws a single card from the deck"""
-        card = np.random.randint(0, len(self.deck))
-        return self.deck.pop(card)
+        """Draws a single card from the shoe. Reshuffles mid-hand if the shoe runs out."""
+        if not len(self.shoe):
+            self._create_shoe(self.player_cards + self.dealer_hand)
+        return self.shoe.draw()
             
     def _deal_cards(self):
-        """Deals the deck to the player and the dealer"""
-        cards = [self._draw_card() for _ in range(4)]
-        self.player_hand = cards[:2]
-        self.dealer_hand = cards[2:]
+        """Deals the shoe to the player and the dealer"""
+        self.player_hand = []
+        self.player_cards = []
+        self.dealer_hand = []
+        self._player_hard = self._dealer_hard = 0
+        self._player_ace = self._dealer_ace = False
+        self._deal_player()
+        self._deal_player()
+        self._deal_dealer()
+        self._deal_dealer()
+        self._set_pair()
+        
+    def _deal_player(self):
+        """Gives the player a card and updates the running total in O(1)"""
+        card = self._draw_card()
+        self.player_hand.append(card)
+        self.player_cards.append(card)
+        value = CARD_VALUES[card]
+        if value == 11:
+            self._player_ace = True
+            self._player_hard += 1
+        else:
+            self._player_hard += value
+        self.player_soft = self._player_ace and self._player_hard <= 11
+        self.player_sum = self._player_hard + 10 if self.player_soft else self._player_hard
+        
+    def _deal_dealer(self):
+        """Gives the dealer a card and updates the running total in O(1)"""
+        card = self._draw_card()
+        self.dealer_hand.append(card)
+        value = CARD_VALUES[card]
+        if value == 11:
+            self._dealer_ace = True
+            self._dealer_hard += 1
+        else:
+            self._dealer_hard += value
+        self.dealer_soft = self._dealer_ace and self._dealer_hard <= 11
+        self.dealer_sum = self._dealer_hard + 10 if self.dealer_soft else self._dealer_hard
         
     def render(self):
-        """Renders the game"""
+        """
+        Renders the game. A frame is only redrawn when the hands change, and human mode drops frames
+        that would exceed render_fps. In rgb_array mode the frame is drawn offscreen and returned as an array.
+        """
+        if self.render_mode is None:
+            return None
+        if self.screen is None:
+            screen_width = 550
+            screen_height = 400
+            from gym_env.rendering import BlackjackWindow # pyglet is only loaded once something is rendered
+            self.screen = BlackjackWindow(screen_width + 50, screen_height + 50, headless=self.render_mode == "rgb_array")
+            
+        state = (tuple(self.player_hand), tuple(self.dealer_hand), bool(self.terminated))
+        if state == self.rendered_state:
+            if self.render_mode == "human":
+                self.screen.dispatch_events()
+            return self.frame
+        
+        if self.render_mode == "human":
+            now = time.perf_counter()
+            if now - self.last_frame_time < 1 / self.metadata["render_fps"]:
+                self.screen.dispatch_events()
+                return None
+            self.last_frame_time = now
+            
+        self._render_frame()
+        self.rendered_state = state
         if self.render_mode == "human":
-            self._render_human()
             self.screen.update()
+        else:
+            self.frame = self.screen.get_frame()
+        return self.frame
     
-    def _render_human(self):
-        """Renders the game"""
-        screen_width = 550
-        screen_height = 400
-        
-        if self.screen is None:
-            self.screen = BlackjackWindow(screen_width + 50, screen_height + 50)
-        self.screen.reset()
-        
-        player_sum, dealer_card, _ = self.observation
+    def _render_frame(self):
+        """Places the cards and totals on the screen and draws them"""
+        player_sum, dealer_card = self.observation[:2]
         
         # Dealer's cards
         x, y = 250 - 50 * (len(self.dealer_hand) - 2), 100
-        for c in self.dealer_hand[:-1]:
-            self.screen.card(x, y, c)
+        for i, c in enumerate(self.dealer_hand[:-1]):
+            self.screen.card(("dealer", i), x, y, card_str(c))
             x += 100
+        last = ("dealer", len(self.dealer_hand) - 1)
         if not self.terminated:
-            self.screen.text(f"Dealer Card: {dealer_card}", 300, 40)
-            self.screen.card(x, y, "HIDDEN")
+            self.screen.text("dealer_total", f"Dealer Card: {dealer_card}", 300, 40)
+            self.screen.card(last, x, y, "HIDDEN")
         else:
-            dealer_sum, _ = self._get_hand_value(self.dealer_hand)
-            self.screen.text(f"Dealer Sum: {dealer_sum}", 300, 40)
-            self.screen.card(x, y, self.dealer_hand[-1])
+            self.screen.text("dealer_total", f"Dealer Sum: {self.dealer_sum}", 300, 40)
+            self.screen.card(last, x, y, card_str(self.dealer_hand[-1]))
         
         # Player's cards
-        self.screen.text(f"Player Sum: {player_sum}", 300, 240)
+        self.screen.text("player_total", f"Player Sum: {player_sum}", 300, 240)
         x, y = 250 - 50 * (len(self.player_hand) - 2), 300
-        for c in self.player_hand:
-            self.screen.card(x, y, c)
+        for i, c in enumerate(self.player_hand):
+            self.screen.card(("player", i), x, y, card_str(c))
             x += 100
+        
+        # Cards left over from a longer previous hand
+        for i in range(len(self.dealer_hand), len(self.screen.labels)):
+            self.screen.hide(("dealer", i))
+        for i in range(len(self.player_hand), len(self.screen.labels)):
+            self.screen.hide(("player", i))
+        self.screen.draw()
     
     def close(self):
         """Closes the environment. Used to stop any rendering"""
-        pass
+        if self.screen is not None:
+            self.screen.close()
+            self.screen = None
+            self.rendered_state = None
     
 if __name__ == "__main__":
     # User play
@@ -270,20 +527,20 @@ if __name__ == "__main__":
     while True:
         bj.reset()
         
-        print("Dealer's Card:", bj.dealer_hand[0])
+        print("Dealer's Card:", card_str(bj.dealer_hand[0]))
         
         bj.render()
         
         while not bj.terminated:
             bj.render()
-            print("Your Hand:", bj.player_hand)
+            print("Your Hand:", hand_str(bj.player_hand))
             print("0 = STAY, 1 = HIT, 2 = DOUBLE")
             act = input("Make your move: ")
             bj.step(int(act))
         
         bj.render()
-        print("Your Hand:", bj.player_hand)
-        print("Dealer's Hand:", bj.dealer_hand) 
+        print("Your Hand:", hand_str(bj.player_hand))
+        print("Dealer's Hand:", hand_str(bj.dealer_hand)) 
             
         if bj.reward > 0:
             print(f"You won {bj.reward}!")
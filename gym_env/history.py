@@ -0,0 +1,158 @@
+"""Binary hand-history recording, reading and replay"""
+
+import queue
+import threading
+
+import numpy as np
+
+from gym_env.env import Blackjack
+
+MAGIC = b"BJHH"
+VERSION = 2
+MAX_CARDS = 22 # At most 21 aces counted as 1 plus the card that busts the hand
+MAX_ACTIONS = 22
+
+def hand_record(max_hands=1):
+    """
+    One fixed-width record per round, with room for the cards and actions of max_hands split hands.
+    Cards are card codes from gym_env.shoe, actions are Action values.
+    """
+    return np.dtype([
+        ("hand", "<u8"),
+        ("reward", "<f4"),
+        ("bet", "<f4"),
+        ("num_player_cards", "<u2"),
+        ("num_dealer_cards", "u1"),
+        ("num_actions", "<u2"),
+        ("player_cards", "i1", MAX_CARDS * max_hands),
+        ("dealer_cards", "i1", MAX_CARDS),
+        ("actions", "u1", MAX_ACTIONS * max_hands),
+    ])
+
+HAND_RECORD = hand_record()
+HEADER = np.dtype([("magic", "S4"), ("version", "<u4"), ("record_size", "<u8"), ("max_hands", "<u4")])
+
+class HandHistoryRecorder:
+    """
+    Appends one fixed-width binary record per finished hand to a file.
+    Records are collected in a preallocated buffer and full buffers are written by a background thread,
+    so recording never blocks on file I/O.
+    """
+
+    def __init__(self, path, buffer_size=4096, max_hands=1):
+        """
+        Args:
+            path (str): File to append to. A header is written if the file is new
+            buffer_size (int): Number of records per write
+            max_hands (int): Most hands a recorded round can be split into, the max_hands of the env's Rules.
+                Taken from the file when it already exists
+        """
+        self.path = path
+        self.buffer_size = buffer_size
+        self.max_hands = max_hands
+        self.hands = 0
+        self._file = open(path, "ab")
+        if self._file.tell() == 0:
+            self.dtype = hand_record(max_hands)
+            header = np.zeros((), dtype=HEADER)
+            header["magic"], header["version"], header["record_size"] = MAGIC, VERSION, self.dtype.itemsize
+            header["max_hands"] = max_hands
+            self._file.write(header.tobytes())
+        else:
+            self.max_hands = int(_check_header(path)["max_hands"])
+            self.dtype = hand_record(self.max_hands)
+            self.hands = (self._file.tell() - HEADER.itemsize) // self.dtype.itemsize
+        self._buffer = np.zeros(buffer_size, dtype=self.dtype)
+        self._n = 0
+        self._queue = queue.Queue(maxsize=8)
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer.start()
+
+    def record(self, player_hand, dealer_hand, actions, bet, reward):
+        """Adds one finished hand"""
+        rec = self._buffer[self._n]
+        rec["hand"] = self.hands
+        rec["reward"] = reward
+        rec["bet"] = bet
+        rec["num_player_cards"] = len(player_hand)
+        rec["num_dealer_cards"] = len(dealer_hand)
+        rec["num_actions"] = len(actions)
+        rec["player_cards"][:len(player_hand)] = player_hand
+        rec["dealer_cards"][:len(dealer_hand)] = dealer_hand
+        rec["actions"][:len(actions)] = actions
+        self.hands += 1
+        self._n += 1
+        if self._n == self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        """Hands the buffered records to the writer thread"""
+        if self._n:
+            self._queue.put(self._buffer[:self._n])
+            self._buffer = np.zeros(self.buffer_size, dtype=self.dtype)
+            self._n = 0
+
+    def close(self):
+        """Writes every pending record and closes the file"""
+        if self._file.closed:
+            return
+        self.flush()
+        self._queue.put(None)
+        self._writer.join()
+        self._file.close()
+
+    def _write_loop(self):
+        while True:
+            records = self._queue.get()
+            if records is None:
+                break
+            self._file.write(records.tobytes())
+        self._file.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def _check_header(path):
+    """Returns the header of a hand history file"""
+    header = np.fromfile(path, dtype=HEADER, count=1)
+    if len(header) != 1 or header["magic"][0] != MAGIC:
+        raise ValueError(f"{path} is not a hand history file")
+    header = header[0]
+    if header["version"] != VERSION or header["record_size"] != hand_record(int(header["max_hands"])).itemsize:
+        raise ValueError(f"{path} was written by an incompatible hand history version")
+    return header
+
+def read_history(path):
+    """Memory-maps a hand history file as an array of hand_record(max_hands) records"""
+    header = _check_header(path)
+    return np.memmap(path, dtype=hand_record(int(header["max_hands"])), mode="r", offset=HEADER.itemsize)
+
+def deal_order(record):
+    """
+    Cards of a recorded hand in the order they left the shoe:
+    two to the player, two to the dealer, the player's draws, then the dealer's draws.
+    """
+    player = record["player_cards"][:record["num_player_cards"]].tolist()
+    dealer = record["dealer_cards"][:record["num_dealer_cards"]].tolist()
+    return player[:2] + dealer[:2] + player[2:] + dealer[2:]
+
+def replay(record, render_mode=None, rules=None):
+    """
+    Rebuilds a recorded hand by dealing its cards into a fresh Blackjack env and replaying its actions.
+    Returns the env in its final state.
+
+    Args:
+        rules (Rules, optional): Rules the hand was played under. Needed to replay splits and surrenders
+    """
+    cards = deal_order(record)
+    env = Blackjack(render_mode=render_mode, verbose=False, cut_card=len(cards), rules=rules)
+    env.shoe.stack(cards)
+    env.reset()
+    for action in record["actions"][:record["num_actions"]]:
+        env.render()
+        env.step(int(action))
+    env.render()
+    return env
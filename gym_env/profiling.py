@@ -0,0 +1,120 @@
+"""Opt-in per-phase timers and call counters for the env's hot path"""
+
+import time
+
+# Method name on Blackjack -> phase it is timed under
+ENV_PHASES = {
+    "reset": "reset",
+    "step": "step",
+    "_deal_cards": "deal",
+    "_draw_card": "draw",
+    "_process_dealer": "dealer",
+    "_get_observation": "observation",
+    "_get_legal_moves": "legal_moves",
+    "_check_game_over": "game_over_check",
+    "_game_over": "settle",
+    "render": "render",
+}
+
+# Method name on Agent -> phase it is timed under
+AGENT_PHASES = {
+    "action": "decision",
+    "_table_action": "decision",
+}
+
+class PhaseProfiler:
+    """
+    Cumulative nanosecond timers and call counters per phase.
+
+    Instrumenting an object shadows its methods with timed wrappers on the instance itself,
+    so objects that are not instrumented run exactly the code they always did.
+    Phases nest: the time of "draw" is also part of "deal" and "step".
+    """
+
+    def __init__(self, snapshot_every=None, on_snapshot=None):
+        """
+        Args:
+            snapshot_every (int, optional): Take a snapshot every this many hands (calls to reset)
+            on_snapshot (callable, optional): Called with each snapshot. Snapshots are kept in self.snapshots otherwise
+        """
+        self.snapshot_every = snapshot_every
+        self.on_snapshot = on_snapshot
+        self.ns = {}
+        self.calls = {}
+        self.hands = 0
+        self.snapshots = []
+        self._instrumented = []
+
+    def instrument(self, obj, phases):
+        """Times each method of obj named in phases, e.g. ENV_PHASES"""
+        for method_name, phase in phases.items():
+            if method_name in vars(obj) or not hasattr(obj, method_name):
+                continue
+            self.ns.setdefault(phase, 0)
+            self.calls.setdefault(phase, 0)
+            method = getattr(obj, method_name)
+            wrapper = self._timed_reset(method, phase) if method_name == "reset" else self._timed(method, phase)
+            setattr(obj, method_name, wrapper)
+            self._instrumented.append((obj, method_name))
+
+    def uninstrument(self, obj=None):
+        """Removes the timed wrappers from obj, or from every instrumented object"""
+        remaining = []
+        for instrumented, method_name in self._instrumented:
+            if obj is None or instrumented is obj:
+                delattr(instrumented, method_name)
+            else:
+                remaining.append((instrumented, method_name))
+        self._instrumented = remaining
+
+    def as_dict(self):
+        """Cumulative nanoseconds and calls per phase"""
+        return {phase: {"ns": self.ns[phase], "calls": self.calls[phase]} for phase in self.ns}
+
+    def snapshot(self):
+        """Records the current totals together with the number of hands played"""
+        snap = {"hands": self.hands, "time_ns": time.perf_counter_ns(), "phases": self.as_dict()}
+        if self.on_snapshot is not None:
+            self.on_snapshot(snap)
+        else:
+            self.snapshots.append(snap)
+        return snap
+
+    def reset(self):
+        """Zeroes every timer and counter"""
+        for phase in self.ns:
+            self.ns[phase] = 0
+            self.calls[phase] = 0
+        self.hands = 0
+        self.snapshots = []
+
+    def report(self):
+        """Human readable table of the phases, slowest first"""
+        lines = [f"{'phase':<16}{'calls':>12}{'total ms':>12}{'ns/call':>10}"]
+        for phase, ns in sorted(self.ns.items(), key=lambda item: -item[1]):
+            calls = self.calls[phase]
+            lines.append(f"{phase:<16}{calls:>12}{ns / 1e6:>12.1f}{ns / calls if calls else 0:>10.0f}")
+        return "\n".join(lines)
+
+    def _timed(self, method, phase):
+        ns, calls, clock = self.ns, self.calls, time.perf_counter_ns
+
+        def timed(*args, **kwargs):
+            start = clock()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                ns[phase] += clock() - start
+                calls[phase] += 1
+        return timed
+
+    def _timed_reset(self, method, phase):
+        timed = self._timed(method, phase)
+
+        def timed_reset(*args, **kwargs):
+            result = timed(*args, **kwargs)
+            self.hands += 1
+            if self.snapshot_every and self.hands % self.snapshot_every == 0:
+                self.snapshot()
+            return result
+        return timed_reset
@@ -1,8 +1,14 @@
+import sys
+
+import numpy as np
 import pyglet
 
 class BlackjackWindow:
-    """Class for rendering"""
-    
+    """
+    Class for rendering. Labels are created once, kept in a pyglet Batch and only updated when their
+    text or position changes, so a frame is a single batch draw.
+    """
+
     unicode_hex = 0x1f0a1 # Starting card. See https://en.wikipedia.org/wiki/Playing_cards_in_Unicode
     card_to_unicode = {}
     for suit in "SHDC":
@@ -12,46 +18,90 @@ class BlackjackWindow:
             unicode_hex += 1
         unicode_hex += 2
     card_to_unicode["HIDDEN"] = chr(0x1f0a0)
-    
-    def __init__(self, X, Y):
+
+    def __init__(self, X, Y, headless=False):
+        """
+        Args:
+            X (int): Width of the window
+            Y (int): Height of the drawing area
+            headless (bool): Render offscreen without a display, e.g. to record rgb_array frames on a server
+        """
+        if headless and "pyglet.window" not in sys.modules:
+            pyglet.options["headless"] = True # Has to be set before pyglet creates its first window
         self.active = True
         self.width = X
-        self.height = Y
-        self.display_surface = pyglet.window.Window(width=X, height=Y+50)
+        self.height = Y + 50
+        self.display_surface = pyglet.window.Window(width=X, height=Y+50, visible=not headless)
         self.top = Y
-        
+        self.batch = pyglet.graphics.Batch()
+        self.labels = {}
+
         # make OpenGL context current
         self.display_surface.switch_to()
         self.reset()
-        
-    def text(self, text, x, y, font_size=20, color=(255, 255, 255)):
-        """Draw text"""
+
+    def text(self, key, text, x, y, font_size=20, color=(255, 255, 255, 255)):
+        """Place text. The label for each key is created on first use and reused afterwards."""
         y = self.top - y
-        label = pyglet.text.Label(text, font_size=font_size, 
-                                  x=x, y=y, anchor_x='center', anchor_y='center',
-                                  color=color)
-        label.draw()
-    
-    def card(self, x, y, c):
-        """Draw a card"""
+        label = self.labels.get(key)
+        if label is None:
+            self.labels[key] = pyglet.text.Label(text, font_size=font_size,
+                                                 x=x, y=y, anchor_x='center', anchor_y='center',
+                                                 color=color, batch=self.batch)
+            return
+        if label.text != text:
+            label.text = text
+        if label.x != x:
+            label.x = x
+        if label.y != y:
+            label.y = y
+
+    def card(self, key, x, y, c):
+        """Place a card"""
         card = self.card_to_unicode[c]
-        self.text(card, x, y, font_size=100)
-        
+        self.text(key, card, x, y, font_size=100)
+
+    def hide(self, key):
+        """Hide a label that is not part of the current frame"""
+        label = self.labels.get(key)
+        if label is not None and label.text:
+            label.text = ""
+
     def reset(self):
         """New frame"""
-        pyglet.clock.tick()
-        self.display_surface.dispatch_events()
+        self.dispatch_events()
         from pyglet.gl import glClear
         glClear(pyglet.gl.GL_COLOR_BUFFER_BIT)
 
+    def dispatch_events(self):
+        """Keeps the window responsive without drawing"""
+        pyglet.clock.tick()
+        self.display_surface.dispatch_events()
+
+    def draw(self):
+        """Draw every label"""
+        self.reset()
+        self.batch.draw()
+
     def update(self):
         """Draw the current state on screen"""
         self.display_surface.flip()
-        
+
+    def get_frame(self):
+        """Reads the drawn frame back as an (height, width, 3) uint8 array"""
+        buffer = pyglet.image.get_buffer_manager().get_color_buffer()
+        data = buffer.get_image_data().get_data("RGB", buffer.width * 3)
+        frame = np.frombuffer(data, dtype=np.uint8).reshape(buffer.height, buffer.width, 3)
+        return frame[::-1].copy() # OpenGL rows start at the bottom
+
+    def close(self):
+        self.display_surface.close()
+        self.active = False
+
 if __name__ == '__main__':
     bjw = BlackjackWindow(400, 400)
 
-    bjw.reset()
-    bjw.card(100, 100, "HIDDEN")
+    bjw.card("card", 100, 100, "HIDDEN")
+    bjw.draw()
     bjw.update()
-    input()
\ No newline at end of file
+    input()
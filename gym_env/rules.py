@@ -0,0 +1,111 @@
+"""House rules of Blackjack as a declarative config, compiled into the lookup tables the env steps with"""
+
+from gym_env.enums import Action, BASIC_ACTIONS, action_mask
+
+# Two card totals that may be doubled under each doubling rule. None means any two cards
+DOUBLE_ON = {"any": None, "9-11": (9, 10, 11), "10-11": (10, 11)}
+
+# Codes of a finished hand in the payout table. Totals 0-21 are their own code
+BUST = 22
+BLACKJACK = 23
+SURRENDERED = 24
+
+# Pair codes of a two card hand
+NO_PAIR, PAIR, ACES = 0, 1, 2
+
+MAX_HARD = 32 # Hard totals, aces counted as 1, that a hand can reach before it stops drawing
+
+STAY_HIT_MASK = action_mask([Action.STAY, Action.HIT])
+EVERY_ACTION_MASK = action_mask(Action)
+# A hand made by splitting aces, when such hands may not act, can only stay or split another ace
+SPLIT_ACES_MASK = action_mask([Action.STAY, Action.SPLIT])
+
+class Rules:
+    """
+    A rule variant. The defaults are the rules gym_env.env.Blackjack has always played: dealer stands on soft 17,
+    blackjack pays 3:2 (even against a dealer blackjack), double on any two cards, no surrender and no splits.
+    Everything the env looks up per step is compiled once in the constructor:
+
+        dealer_stands[hard][ace]                                Whether the dealer stops drawing
+        two_card_masks[hands][pair][player sum][usable ace]     Legal actions on a two card hand
+        payout[player hand code][dealer hand code]              Reward per unit bet
+    """
+
+    def __init__(self, hit_soft_17=False, blackjack_payout=1.5, double_on="any", double_after_split=True,
+                 surrender=False, max_hands=1, resplit_aces=False, hit_split_aces=False):
+        """
+        Args:
+            hit_soft_17 (bool): Whether the dealer hits a soft 17
+            blackjack_payout (float): What a player blackjack pays, in units of the bet
+            double_on (str): Two card hands that may be doubled: "any", "9-11" or "10-11" (hard totals)
+            double_after_split (bool): Whether a hand made by splitting may be doubled
+            surrender (bool): Late surrender of the first two cards for half the bet
+            max_hands (int): Most hands a round can be split into. 1 disables splitting, 2 allows a single split
+            resplit_aces (bool): Whether a split ace that draws another ace may be split again
+            hit_split_aces (bool): Whether hands made by splitting aces may act. If not, they get one card each
+        """
+        if double_on not in DOUBLE_ON:
+            raise ValueError(f"double_on must be one of {sorted(DOUBLE_ON)}, got {double_on!r}")
+        if max_hands < 1:
+            raise ValueError(f"max_hands must be at least 1, got {max_hands}")
+        self.hit_soft_17 = hit_soft_17
+        self.blackjack_payout = blackjack_payout
+        self.double_on = double_on
+        self.double_after_split = double_after_split
+        self.surrender = surrender
+        self.max_hands = max_hands
+        self.resplit_aces = resplit_aces
+        self.hit_split_aces = hit_split_aces
+
+        self.actions = tuple(BASIC_ACTIONS + (Action.SURRENDER,) * surrender + (Action.SPLIT,) * (max_hands > 1))
+        self.dealer_stands = tuple(tuple(self._dealer_stands(hard, ace) for ace in (False, True)) for hard in range(MAX_HARD))
+        self.two_card_masks = tuple(
+            tuple(
+                tuple(tuple(self._two_card_mask(hands, pair, player_sum, soft) for soft in (False, True)) for player_sum in range(22))
+                for pair in (NO_PAIR, PAIR, ACES)
+            )
+            for hands in range(max_hands + 1) # Index 0 is unused
+        )
+        dealer_codes = range(BLACKJACK + 1)
+        self.payout = tuple(tuple(self._payout(player, dealer) for dealer in dealer_codes) for player in range(SURRENDERED + 1))
+
+    def __repr__(self):
+        return (
+            f"Rules(hit_soft_17={self.hit_soft_17}, blackjack_payout={self.blackjack_payout}, "
+            f"double_on={self.double_on!r}, double_after_split={self.double_after_split}, surrender={self.surrender}, "
+            f"max_hands={self.max_hands}, resplit_aces={self.resplit_aces}, hit_split_aces={self.hit_split_aces})"
+        )
+
+    def _dealer_stands(self, hard, ace):
+        soft = ace and hard + 10 <= 21
+        total = hard + 10 if soft else hard
+        return total >= 17 and not (self.hit_soft_17 and soft and total == 17)
+
+    def _two_card_mask(self, hands, pair, player_sum, soft):
+        mask = STAY_HIT_MASK
+        after_split = hands > 1
+        totals = DOUBLE_ON[self.double_on]
+        if (totals is None or not soft and player_sum in totals) and (self.double_after_split or not after_split):
+            mask |= action_mask([Action.DOUBLE])
+        if self.surrender and not after_split:
+            mask |= action_mask([Action.SURRENDER])
+        if pair != NO_PAIR and 0 < hands < self.max_hands and (pair != ACES or hands == 1 or self.resplit_aces):
+            mask |= action_mask([Action.SPLIT])
+        return mask
+
+    def _payout(self, player, dealer):
+        """
+        Same order as the env always settled in: blackjack, player bust, dealer blackjack, dealer bust, totals.
+        Whole payouts are ints, like the rewards the env always returned, so most rewards are cached small ints.
+        """
+        if player == SURRENDERED:
+            return -0.5
+        if player == BLACKJACK:
+            return self.blackjack_payout
+        if player == BUST or dealer == BLACKJACK:
+            return -1
+        if dealer == BUST or player > dealer:
+            return 1
+        return -1 if player < dealer else 0
+
+DEFAULT_RULES = Rules() # Its tables are immutable, so every env on the default rules shares them
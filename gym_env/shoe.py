@@ -0,0 +1,96 @@
+"""Array-backed shoe of integer card codes"""
+
+import numpy as np
+
+RANKS = "23456789TJQKA"
+SUITS = "SHCD"
+
+# Card code = 4 * rank index + suit index, so a single deck is codes 0-51
+CARD_VALUES = tuple(value for value in (2, 3, 4, 5, 6, 7, 8, 9, 10, 10, 10, 10, 11) for _ in SUITS)
+CARD_NAMES = tuple(rank + suit for rank in RANKS for suit in SUITS)
+# Hi-Lo count of each card code: +1 for 2-6, 0 for 7-9, -1 for tens and aces
+HI_LO = tuple(1 if value <= 6 else -1 if value >= 10 else 0 for value in CARD_VALUES)
+
+def card_str(card):
+    """Name of a card code, e.g. 'TS'. Face cards and suits are preserved for rendering purposes."""
+    return CARD_NAMES[card]
+
+def hand_str(hand):
+    """Names of every card in a hand"""
+    return [CARD_NAMES[card] for card in hand]
+
+class Shoe:
+    """
+    One or more decks held as a small-int array.
+    The shoe is shuffled up front and dealt by advancing a pointer, so every draw is O(1).
+    It persists across hands and is only reshuffled once the cut card is reached.
+    The Hi-Lo running count of the dealt cards is kept up to date as they are drawn.
+    """
+
+    def __init__(self, num_decks=1, penetration=None, cut_card=None):
+        """
+        Args:
+            num_decks (int): The number of decks in the shoe
+            penetration (float, optional): Fraction of the shoe dealt before it is reshuffled
+            cut_card (int, optional): Number of cards dealt before the shoe is reshuffled. Overrides penetration.
+                If neither is given the shoe is reshuffled before every hand.
+        """
+        self.num_decks = num_decks
+        self._ordered = np.tile(np.arange(len(CARD_NAMES), dtype=np.int8), num_decks)
+        self.cards = self._ordered.copy()
+        self.pos = len(self.cards) # A new shoe has to be shuffled before dealing
+        self.running_count = 0
+        
+        if cut_card is None and penetration is not None:
+            if not 0 < penetration <= 1:
+                raise ValueError(f"Penetration must be in (0, 1], got {penetration}")
+            cut_card = int(penetration * len(self.cards))
+        if cut_card is not None and not 0 < cut_card <= len(self.cards):
+            raise ValueError(f"Cut card must be between 1 and {len(self.cards)}, got {cut_card}")
+        self.cut_card = cut_card
+
+    def needs_shuffle(self):
+        """Whether the cut card has been reached. Always true when the shoe is reshuffled every hand."""
+        return self.cut_card is None or self.pos >= self.cut_card
+
+    def shuffle(self, np_random, in_play=()):
+        """
+        Collects every card back into the shoe and shuffles it with the given Generator
+
+        Args:
+            np_random (np.random.Generator): Random generator used to shuffle
+            in_play (list, optional): Card codes still on the table. They are kept out of the new shoe.
+        """
+        self.cards[:] = self._ordered
+        np_random.shuffle(self.cards)
+        self.pos = 0
+        self.running_count = 0
+        for card in in_play:
+            i = self.pos + int(np.argmax(self.cards[self.pos:] == card))
+            self.cards[[self.pos, i]] = self.cards[[i, self.pos]]
+            self.pos += 1
+            self.running_count += HI_LO[card] # Cards in play count as dealt
+
+    def stack(self, cards):
+        """Puts the given card codes on top of the shoe, to be dealt next in that order. Used to replay hands."""
+        self.cards[:len(cards)] = cards
+        self.pos = 0
+        self.running_count = 0
+
+    def draw(self):
+        """Deals the next card code"""
+        card = int(self.cards[self.pos])
+        self.pos += 1
+        self.running_count += HI_LO[card]
+        return card
+
+    def true_count(self):
+        """Running count per deck left in the shoe"""
+        return self.running_count * len(CARD_NAMES) / max(len(self), 1)
+
+    def remaining(self):
+        """Card codes that have not been dealt yet"""
+        return self.cards[self.pos:]
+
+    def __len__(self):
+        return len(self.cards) - self.pos
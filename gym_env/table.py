@@ -0,0 +1,216 @@
+"""Blackjack table with several seats, each played by its own agent, against one dealer hand and one shoe"""
+
+import numpy as np
+
+from gym.utils import seeding
+from gym_env.enums import Action
+from gym_env.env import LEGAL_MOVES, NO_ACTIONS_MASK, STAY_HIT_MASK, ALL_ACTIONS_MASK
+from gym_env.shoe import Shoe, CARD_VALUES
+
+class BlackjackTable:
+    """
+    num_seats players against one dealer, dealt from one shared shoe in real deal order: a card to every seat,
+    the dealer's show card, a second card to every seat, then the hole card. Seats act in order, the dealer's hand
+    is played once per round and every seat is settled at once.
+
+    Each seat follows the rules of gym_env.env.Blackjack: dealer stands on 17, blackjack pays 3:2 (even against
+    a dealer blackjack), double only on the first two cards and illegal actions are ignored.
+    """
+
+    def __init__(self, num_seats=5, num_decks=1, penetration=None, cut_card=None):
+        """
+        Args:
+            num_seats (int): The number of players at the table
+            num_decks (int): The number of decks in the shoe
+            penetration (float, optional): Fraction of the shoe dealt before reshuffling. If None, every round uses a fresh shoe
+            cut_card (int, optional): Number of cards dealt before reshuffling. Overrides penetration
+        """
+        self.num_seats = num_seats
+        self.shoe = Shoe(num_decks, penetration, cut_card)
+        self.np_random = None
+        self.reshuffled = False
+        # Per-seat state is kept in lists, which are faster than arrays for one card at a time
+        self.player_hands = None
+        self.dealer_hand = None
+        self.player_sum = [0] * num_seats
+        self.player_soft = [False] * num_seats
+        self._player_hard = [0] * num_seats
+        self._player_ace = [False] * num_seats
+        self.dealer_sum = None
+        self.dealer_soft = None
+        self._dealer_hard = None
+        self._dealer_ace = None
+        self.bet = [1] * num_seats
+        self.reward = np.zeros(num_seats, dtype=np.float64)
+        self.done = [False] * num_seats # Seats that have finished acting
+        self.seat = None # Seat to act
+        self.action_mask = NO_ACTIONS_MASK
+        self.terminated = None
+        self.observation = np.zeros((num_seats, 3), dtype=np.float32) # One row per seat, written in place
+        self._no_reward = np.zeros(num_seats, dtype=np.float64)
+
+    @property
+    def legal_moves(self):
+        """Legal actions of the seat to act"""
+        return LEGAL_MOVES[self.action_mask]
+
+    def reset(self, seed=None):
+        """Deals a new round. Returns the (num_seats, 3) observation and an info dict."""
+        if seed is not None or self.np_random is None:
+            self.np_random, _ = seeding.np_random(seed)
+        self.reshuffled = False
+        if seed is not None or self.shoe.needs_shuffle():
+            self._create_shoe()
+
+        self.player_hands = [[] for _ in range(self.num_seats)]
+        self.dealer_hand = []
+        num_seats = self.num_seats
+        self._player_hard = [0] * num_seats
+        self._player_ace = [False] * num_seats
+        self._dealer_hard = 0
+        self._dealer_ace = False
+        self.bet = [1] * num_seats
+        self.reward[:] = 0
+        self.terminated = False
+        for seat in range(self.num_seats):
+            self._deal_player(seat)
+        self._deal_dealer()
+        for seat in range(self.num_seats):
+            self._deal_player(seat)
+        self._deal_dealer()
+        self.observation[:, 1] = CARD_VALUES[self.dealer_hand[0]]
+
+        dealer_blackjack = self.dealer_sum == 21
+        self.done = [dealer_blackjack or player_sum == 21 for player_sum in self.player_sum] # Naturals end at once
+        self.seat = -1
+        self._next_seat()
+        return self.observation, self._info()
+
+    def step(self, action):
+        """
+        The seat to act takes an action. Once every seat is done, the dealer plays and the round is settled.
+
+        Returns:
+            observation, reward, terminated, truncated, info. The (num_seats,) rewards are all reported on the last step.
+        """
+        if not self.terminated:
+            action = Action(action)
+            seat = self.seat
+            if self.action_mask >> action.value & 1:
+                if action == Action.STAY:
+                    self.done[seat] = True
+                elif action == Action.HIT:
+                    self._deal_player(seat)
+                    self.done[seat] = self.player_sum[seat] > 21
+                elif action == Action.DOUBLE:
+                    self._deal_player(seat)
+                    self.bet[seat] *= 2
+                    self.done[seat] = True
+                if self.done[seat]:
+                    self._next_seat()
+                else:
+                    self.action_mask = STAY_HIT_MASK
+        reward = self.reward if self.terminated else self._no_reward
+        return self.observation, reward, self.terminated, False, self._info()
+
+    def play_round(self, agents):
+        """
+        Plays one round, agents[i] deciding for seat i
+
+        Returns:
+            np.ndarray of the seats' rewards. Overwritten by the next round.
+        """
+        actions = [agent.action if agent.policy_table is None else agent._table_action for agent in agents]
+        self.reset()
+        while not self.terminated:
+            self.step(actions[self.seat](self.legal_moves, self.observation[self.seat]))
+        return self.reward
+
+    def run(self, agents, rounds=100, seed=None):
+        """Plays rounds with agents[i] in seat i. Returns a (rounds, num_seats) array of rewards."""
+        rewards = np.zeros((rounds, self.num_seats))
+        if seed is not None:
+            self.reset(seed=seed)
+        for r in range(rounds):
+            rewards[r] = self.play_round(agents)
+        return rewards
+
+    def _info(self):
+        return {"seat": self.seat, "action_mask": self.action_mask, "reshuffled": self.reshuffled}
+
+    def _next_seat(self):
+        """Moves to the next seat that still has to act, or finishes the round"""
+        for seat in range(self.seat + 1, self.num_seats):
+            if not self.done[seat]:
+                self.seat = seat
+                self.action_mask = ALL_ACTIONS_MASK if len(self.player_hands[seat]) == 2 else STAY_HIT_MASK
+                return
+        self.seat = None
+        self.action_mask = NO_ACTIONS_MASK
+        self._process_dealer()
+        self._settle()
+
+    def _process_dealer(self):
+        """The dealer plays once for the whole table, unless no seat is left to beat"""
+        if self.dealer_sum == 21 and len(self.dealer_hand) == 2:
+            return
+        if all(player_sum > 21 or player_sum == 21 and len(hand) == 2
+               for player_sum, hand in zip(self.player_sum, self.player_hands)):
+            return
+        while self.dealer_sum < 17:
+            self._deal_dealer()
+
+    def _settle(self):
+        """Pays every seat at once. Same payout order as Blackjack._game_over."""
+        player_sum = np.array(self.player_sum)
+        dealer_sum = self.dealer_sum
+        if dealer_sum == 21 and len(self.dealer_hand) == 2:
+            outcome = np.full(self.num_seats, -1.0)     # Dealer blackjack
+        elif dealer_sum > 21:
+            outcome = np.ones(self.num_seats)           # Dealer busted
+        else:
+            outcome = np.sign(player_sum - dealer_sum).astype(np.float64) # Won, lost or shoved
+        outcome[player_sum > 21] = -1.0                 # Player busted
+        outcome[(player_sum == 21) & (np.array([len(hand) for hand in self.player_hands]) == 2)] = 1.5 # Blackjack
+        np.multiply(outcome, self.bet, out=self.reward)
+        self.terminated = True
+
+    def _create_shoe(self, in_play=()):
+        """Shuffles every card not in play back into the shoe"""
+        self.shoe.shuffle(self.np_random, in_play)
+        self.reshuffled = True
+
+    def _draw_card(self):
+        """Draws a single card from the shoe. Reshuffles mid-round if the shoe runs out."""
+        if not len(self.shoe):
+            self._create_shoe([card for hand in self.player_hands for card in hand] + self.dealer_hand)
+        return self.shoe.draw()
+
+    def _deal_player(self, seat):
+        """Gives a seat a card and updates its running total in O(1)"""
+        card = self._draw_card()
+        self.player_hands[seat].append(card)
+        value = CARD_VALUES[card]
+        if value == 11:
+            self._player_ace[seat] = True
+            self._player_hard[seat] += 1
+        else:
+            self._player_hard[seat] += value
+        soft = self._player_ace[seat] and self._player_hard[seat] <= 11
+        self.player_soft[seat] = soft
+        self.player_sum[seat] = self._player_hard[seat] + 10 if soft else self._player_hard[seat]
+        self.observation[seat, 0] = self.player_sum[seat]
+        self.observation[seat, 2] = soft
+
+    def _deal_dealer(self):
+        """Gives the dealer a card and updates the running total in O(1)"""
+        card = self._draw_card()
+        self.dealer_hand.append(card)
+        value = CARD_VALUES[card]
+        if value == 11:
+            self._dealer_ace = True
+            self._dealer_hard += 1
+        else:
+            self._dealer_hard += value
+        self.dealer_soft = self._dealer_ace and self._dealer_hard <= 11
+        self.dealer_sum = self._dealer_hard + 10 if self.dealer_soft else self._dealer_hard
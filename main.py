@@ -3,7 +3,7 @@ import gym_env
 from agents.agent_random import RandomAgent
 from agents.agent_never_bust import NeverBustAgent
 from agents.agent_basic_strategy import BasicStrategyAgent
-from agents.agent_ppo import PPOAgent
+from agents.agent_tabular import TabularAgent
 
 def main():
     env_name = "blackjack_env-v0"
@@ -11,8 +11,16 @@ def main():
     # agt = RandomAgent("random", bj_env)
     agt = NeverBustAgent("never_bust", bj_env)
     # agt = BasicStrategyAgent("basic_strategy", bj_env)
+    # from agents.agent_counting import CountingAgent # Counting needs a shoe that persists across hands
+    # agt = CountingAgent("counting", gym.make(env_name, verbose=False, num_decks=6, penetration=0.75))
+    # from agents.agent_ppo import PPOAgent # Loads stable_baselines3 and torch
     # agt = PPOAgent("ppo_agent", bj_env)
-    # agt.train(timesteps=400000)
+    # agt.train(timesteps=400000, n_envs=8, checkpoint_freq=100000)
+    # agt.export_numpy() # Then play it without torch:
+    # from agents.agent_numpy import NumpyPolicyAgent
+    # agt = NumpyPolicyAgent("ppo_agent", bj_env)
+    # agt = TabularAgent("tabular", bj_env)
+    # agt.train(episodes=3000000)
     agt.run(episodes=10000)
     # agt.visualize_policy()
     agt.get_metrics()
@@ -0,0 +1,127 @@
+"""
+Load generator for the decision service: many concurrent sessions, each playing hands on its own Blackjack env.
+
+    python -m serving.load --port 8765 --sessions 64 --hands 500
+    python -m serving.load --agent ppo_agent --sessions 64 --hands 500 # Starts a server in this process
+"""
+
+import argparse
+import asyncio
+import time
+
+import numpy as np
+
+from gym_env.env import Blackjack
+from serving.server import REQUEST, RESPONSE, DecisionServer, make_agent
+
+class DecisionClient:
+    """One TCP connection to a DecisionServer. Requests on a connection are answered one at a time."""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def connect(cls, host="127.0.0.1", port=8765):
+        return cls(*await asyncio.open_connection(host, port))
+
+    async def decide(self, observation, action_mask):
+        self.writer.write(REQUEST.pack(*observation, action_mask))
+        action, = RESPONSE.unpack(await self.reader.readexactly(RESPONSE.size))
+        return action
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+async def play_session(decide, hands, seed):
+    """
+    Plays hands on a fresh Blackjack env, asking decide(observation, action_mask) for every action
+
+    Returns:
+        the rewards of the hands and the latency of every decision in nanoseconds
+    """
+    env = Blackjack(verbose=False)
+    rewards = np.zeros(hands)
+    latencies = []
+    env.reset(seed=seed)
+    for hand in range(hands):
+        if hand:
+            env.reset()
+        while not env.terminated:
+            start = time.perf_counter_ns()
+            action = await decide(env.observation, env.action_mask)
+            latencies.append(time.perf_counter_ns() - start)
+            env.step(action)
+        rewards[hand] = env.reward
+    return rewards, latencies
+
+async def generate_load(sessions=64, hands=500, seed=0, server=None, host="127.0.0.1", port=8765):
+    """
+    Runs concurrent sessions against an in-process server, or over TCP when server is None
+
+    Returns:
+        dict with the hands played, the seconds taken, hands and decisions per second, the mean reward and the
+        client-side p50/p99 decision latency in milliseconds
+    """
+    clients = []
+    if server is None:
+        clients = [await DecisionClient.connect(host, port) for _ in range(sessions)]
+        deciders = [client.decide for client in clients]
+    else:
+        deciders = [server.decide] * sessions
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(play_session(decide, hands, seed + i) for i, decide in enumerate(deciders)))
+    seconds = time.perf_counter() - start
+    for client in clients:
+        await client.close()
+
+    rewards = np.concatenate([rewards for rewards, _ in results])
+    latencies = np.concatenate([latencies for _, latencies in results]) / 1e6
+    return {
+        "hands": len(rewards),
+        "seconds": seconds,
+        "hands_per_sec": len(rewards) / seconds,
+        "decisions_per_sec": len(latencies) / seconds,
+        "mean_reward": float(rewards.mean()),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+    }
+
+async def _run(args):
+    if args.agent is None:
+        return await generate_load(args.sessions, args.hands, args.seed, host=args.host, port=args.port), None
+    async with DecisionServer(make_agent(args.agent, args.compile), args.max_batch_size, args.max_latency_ms) as server:
+        if args.tcp:
+            port = await server.listen(args.host, 0)
+            stats = await generate_load(args.sessions, args.hands, args.seed, host=args.host, port=port)
+        else:
+            stats = await generate_load(args.sessions, args.hands, args.seed, server=server)
+        return stats, server.metrics
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the decision service")
+    parser.add_argument("--sessions", type=int, default=64, help="Concurrent game sessions")
+    parser.add_argument("--hands", type=int, default=500, help="Hands per session")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--agent", help="Start a server for this agent in-process instead of connecting to one")
+    parser.add_argument("--tcp", action="store_true", help="With --agent, still go through TCP")
+    parser.add_argument("--compile", action="store_true", help="With --agent, serve its compiled policy table")
+    parser.add_argument("--max-batch-size", type=int, default=256)
+    parser.add_argument("--max-latency-ms", type=float, default=2.0)
+    args = parser.parse_args(argv)
+
+    stats, metrics = asyncio.run(_run(args))
+    print(
+        f"{stats['hands']} hands in {stats['seconds']:.2f}s ({stats['hands_per_sec']:,.0f} hands/s, "
+        f"{stats['decisions_per_sec']:,.0f} decisions/s), mean reward {stats['mean_reward']:.4f}, "
+        f"client latency p50 {stats['p50_ms']:.3f} ms / p99 {stats['p99_ms']:.3f} ms"
+    )
+    if metrics is not None:
+        print(f"Server: {metrics.report()}")
+
+if __name__ == "__main__":
+    main()
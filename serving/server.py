@@ -0,0 +1,238 @@
+"""
+Local asyncio decision service. Requests from many game sessions are gathered into micro-batches
+and answered with one batched forward pass of the agent.
+
+    python -m serving.server ppo_agent --port 8765 --max-batch-size 256 --max-latency-ms 2
+"""
+
+import argparse
+import asyncio
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import gym
+import numpy as np
+
+import gym_env
+from gym_env.enums import Action
+
+# Wire format: the observation as 3 float32 and the legal action bitmask, answered by the Action value
+REQUEST = struct.Struct("<3fB")
+RESPONSE = struct.Struct("<b")
+
+class ServerMetrics:
+    """Queue depth, batch sizes and request latencies over the last window requests"""
+
+    def __init__(self, window=100000):
+        self.requests = 0
+        self.batches = 0
+        self.max_queue_depth = 0
+        self._queue_depth_total = 0
+        self._batch_size_total = 0
+        self.max_batch_size = 0
+        self._latencies = np.zeros(window, dtype=np.int64) # Nanoseconds, ring buffer
+        self._n = 0
+
+    def record_batch(self, latencies_ns, queue_depth):
+        """Adds one batch: the latency of each of its requests and how many requests were waiting when it was taken"""
+        size = len(latencies_ns)
+        self.requests += size
+        self.batches += 1
+        self._batch_size_total += size
+        self.max_batch_size = max(self.max_batch_size, size)
+        self._queue_depth_total += queue_depth
+        self.max_queue_depth = max(self.max_queue_depth, queue_depth)
+        window = len(self._latencies)
+        index = (self._n + np.arange(size)) % window
+        self._latencies[index] = latencies_ns
+        self._n += size
+
+    def latency_ms(self, q):
+        """q-th percentile of the request latency in milliseconds"""
+        latencies = self._latencies[:min(self._n, len(self._latencies))]
+        return float(np.percentile(latencies, q)) / 1e6 if len(latencies) else 0.0
+
+    def snapshot(self):
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "mean_batch_size": self._batch_size_total / self.batches if self.batches else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "mean_queue_depth": self._queue_depth_total / self.batches if self.batches else 0.0,
+            "max_queue_depth": self.max_queue_depth,
+            "p50_ms": self.latency_ms(50),
+            "p99_ms": self.latency_ms(99),
+        }
+
+    def report(self):
+        snap = self.snapshot()
+        return (
+            f"{snap['requests']} requests in {snap['batches']} batches, "
+            f"batch size {snap['mean_batch_size']:.1f} mean / {snap['max_batch_size']} max, "
+            f"queue depth {snap['mean_queue_depth']:.1f} mean / {snap['max_queue_depth']} max, "
+            f"latency p50 {snap['p50_ms']:.3f} ms / p99 {snap['p99_ms']:.3f} ms"
+        )
+
+class DecisionServer:
+    """
+    Answers decide(observation, action_mask) for many concurrent sessions. The first waiting request opens a batch,
+    which is run through agent.batch_action once it holds max_batch_size requests or max_latency_ms has passed.
+    Actions that are not legal under a request's mask are answered with HIT, like the agents do.
+    """
+
+    def __init__(self, agent, max_batch_size=256, max_latency_ms=2.0, threaded=True):
+        """
+        Args:
+            agent (Agent): Agent whose batch_action answers the requests
+            max_batch_size (int): Most requests per forward pass
+            max_latency_ms (float): Longest a request waits for its batch to fill up
+            threaded (bool): Run the forward pass on a worker thread, so requests keep arriving during it
+        """
+        self.agent = agent
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency_ms / 1000
+        self.metrics = ServerMetrics()
+        self._executor = ThreadPoolExecutor(max_workers=1) if threaded else None
+        self._pending = []
+        self._wakeup = None
+        self._full = None
+        self._batcher = None
+        self._tcp_server = None
+
+    async def start(self):
+        """Starts the batching loop. Must be called from the event loop that serves the requests."""
+        self._wakeup = asyncio.Event()
+        self._full = asyncio.Event()
+        self._batcher = asyncio.create_task(self._batch_loop())
+        return self
+
+    async def listen(self, host="127.0.0.1", port=0):
+        """Serves REQUEST/RESPONSE messages over TCP. Returns the port listened on."""
+        self._tcp_server = await asyncio.start_server(self._handle, host, port)
+        return self._tcp_server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        if self._tcp_server is not None:
+            self._tcp_server.close()
+            await self._tcp_server.wait_closed()
+        if self._batcher is not None:
+            self._batcher.cancel()
+            try:
+                await self._batcher
+            except asyncio.CancelledError:
+                pass
+        if self._executor is not None:
+            self._executor.shutdown()
+
+    async def decide(self, observation, action_mask):
+        """
+        Args:
+            observation: Player sum, dealer show card and usable ace. Copied, so env buffers can be passed directly
+            action_mask (int): Bitmask of the legal actions, e.g. Blackjack.action_mask
+
+        Returns:
+            int Action value
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((tuple(observation), action_mask, future, time.perf_counter_ns()))
+        if len(self._pending) == 1:
+            self._wakeup.set()
+        if len(self._pending) >= self.max_batch_size:
+            self._full.set()
+        return await future
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def _batch_loop(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            waited = (time.perf_counter_ns() - self._pending[0][3]) / 1e9
+            if len(self._pending) < self.max_batch_size and waited < self.max_latency:
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.max_latency - waited)
+                except asyncio.TimeoutError:
+                    pass
+            self._full.clear()
+            queue_depth = len(self._pending)
+            batch, self._pending = self._pending[:self.max_batch_size], self._pending[self.max_batch_size:]
+            if self._pending:
+                self._wakeup.set()
+                if len(self._pending) >= self.max_batch_size:
+                    self._full.set()
+            try:
+                await self._answer(batch, queue_depth)
+            except Exception as e: # Fail the batch's requests instead of the whole server
+                for *_, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    async def _answer(self, batch, queue_depth):
+        observations = np.array([request[0] for request in batch], dtype=np.float32)
+        masks = np.array([request[1] for request in batch], dtype=np.int64)
+        can_double = (masks >> Action.DOUBLE.value & 1).astype(bool)
+        if self._executor is not None:
+            loop = asyncio.get_running_loop()
+            actions = await loop.run_in_executor(self._executor, self.agent.batch_action, observations, can_double)
+        else:
+            actions = self.agent.batch_action(observations, can_double)
+        actions = np.asarray(actions, dtype=np.int64)
+        actions[(masks >> actions & 1) == 0] = Action.HIT.value
+
+        done = time.perf_counter_ns()
+        latencies = np.array([done - request[3] for request in batch], dtype=np.int64)
+        for (_, _, future, _), action in zip(batch, actions.tolist()):
+            if not future.done():
+                future.set_result(action)
+        self.metrics.record_batch(latencies, queue_depth)
+
+    async def _handle(self, reader, writer):
+        """One TCP connection: a session sending one request at a time"""
+        try:
+            while True:
+                *observation, action_mask = REQUEST.unpack(await reader.readexactly(REQUEST.size))
+                writer.write(RESPONSE.pack(await self.decide(observation, action_mask)))
+        except asyncio.IncompleteReadError:
+            pass
+        finally:
+            writer.close()
+
+def make_agent(name, compile=False):
+    """Builds a registered agent (see agents.tournament.AGENTS) for serving"""
+    from agents.tournament import agent_class
+    agent = agent_class(name)(name, gym.make("blackjack_env-v0", verbose=False))
+    if compile:
+        agent = agent.compile_policy()
+    return agent
+
+async def serve(agent, host, port, max_batch_size, max_latency_ms, report_every):
+    async with DecisionServer(agent, max_batch_size, max_latency_ms) as server:
+        port = await server.listen(host, port)
+        print(f"Serving {agent.name} on {host}:{port}")
+        while True:
+            await asyncio.sleep(report_every)
+            print(server.metrics.report())
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve an agent's decisions with micro-batching")
+    parser.add_argument("agent", help="Registered agent name, see agents.tournament.AGENTS")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--max-batch-size", type=int, default=256)
+    parser.add_argument("--max-latency-ms", type=float, default=2.0, help="Latency budget for filling a batch")
+    parser.add_argument("--compile", action="store_true", help="Serve the agent's compiled policy table")
+    parser.add_argument("--report-every", type=float, default=10.0, help="Seconds between metrics reports")
+    args = parser.parse_args(argv)
+    agent = make_agent(args.agent, args.compile)
+    try:
+        asyncio.run(serve(agent, args.host, args.port, args.max_batch_size, args.max_latency_ms, args.report_every))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()